@@ -1,27 +1,26 @@
 import ctypes
 import json
-import re
 import sys
-import time
-import traceback
 import webbrowser
-from datetime import datetime
 
-import pykakasi
 import spotipy
 from PyQt6.QtCore import QPoint, QSize
 from PyQt6.QtGui import (QPixmap, QImage, QPalette, QIcon)
 from PyQt6.QtWidgets import (QWidget, QApplication, QPushButton, QMessageBox)
 from colorama import init
-from pythonosc.udp_client import SimpleUDPClient
 from spotipy.oauth2 import SpotifyOAuth
-from winrt.windows.foundation import TimeSpan
-from winrt.windows.media.control import GlobalSystemMediaTransportControlsSessionManager as MediaManager
 
-from utils.lyrics.musixmatch import Song, MusixMatch
+from utils.log import Logger
+from utils.lyrics.cache import LyricsCache
+from utils.lyrics.musixmatch import MusixMatch
+from utils.lyrics.resolver import LyricsResolver
+from utils.media import MprisSource, ReplaySource, SpotifySource, WinRTSource
 from utils.nekowidgets import *
 from utils.lyrics.netease import NetEase
+from utils.osc import AvatarParameter, is_loopback, parse_targets
+from utils.pipeline import ChatboxPipeline, Formatter
 from utils.pulsoid import PulsoidConnector
+from utils.spotify import SpotifyPlayback, SpotifyTokens
 
 import requests
 
@@ -35,112 +34,32 @@ logging.basicConfig(filename=os.path.join(os.getenv('LOCALAPPDATA'), 'Nekoware',
 logger = logging.getLogger(__name__)
 
 
-def print_to_console(text, color=None, app=None):
-    try:
-        if app and hasattr(app.neko_osc_widget, 'console_output') and app.neko_osc_widget.console_output is not None:
-            app.neko_osc_widget.console_output.new_text_signal.emit(text, color)
-        else:
-            print(text)
-    except AttributeError:
-        return
-
-
-class Logger:
-    @staticmethod
-    def log(level, message, raw, color=None):
-        logging.log(level, raw)
-        print_to_console(message, color)
-
-    @staticmethod
-    def info(message):
-        Logger.log(logging.INFO, "\n[INFO] " + message, "lightblue", message)
-
-    @staticmethod
-    def warning(message):
-        Logger.log(logging.WARNING, "\n[WARNING] " + message, "yellow", message)
-
-    @staticmethod
-    def error(message):
-        Logger.log(logging.ERROR, "\n[ERROR] " + message, "red", message)
-
-    @staticmethod
-    def debug(message):
-        Logger.log(logging.DEBUG, "\n[DEBUG] " + message, "lightgreen", message)
-
-
-class VRCClient:
-    def __init__(self, ip='127.0.0.1', port=9000):
-        """Initialize the client with the provided IP and port."""
-        self.ip = ip
-        self.port = port
-        self.client = SimpleUDPClient(ip, port)
-
-    def send_message(self, message):
-        """Send a chat message to VRChat and return True if successful."""
-        try:
-            self.client.send_message('/chatbox/input', [message, True])
-            return True
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            return False
-
-
-class TimeUtils:
-    @staticmethod
-    def format_timespan(timespan: TimeSpan):
-        """Convert a TimeSpan object to milliseconds."""
-        return int(timespan.duration * 0.0001)
-
-    @staticmethod
-    def unformat_timespan(timespan: int):
-        """Convert milliseconds back to the TimeSpan format."""
-        return int(timespan / 0.001)
-
-    @staticmethod
-    def time_to_ms(time_str):
-        """Convert a time string formatted as minutes:seconds to milliseconds."""
-        minutes, seconds = map(int, time_str.split(":"))
-        total_seconds = minutes * 60 + seconds
-        milliseconds = total_seconds * 1000
-        return milliseconds
-
-    @staticmethod
-    def seconds_to_m_s(seconds):
-        """Convert seconds to a string formatted as minutes:seconds."""
-        minutes = int(seconds // 60)
-        seconds_remaining = int(seconds % 60)
-        return f"{minutes}:{seconds_remaining:02}"
-
-
-class NekoOSC(QWidget):
+class NekoOSC(ChatboxPipeline, QWidget):
     def __init__(self):
         super().__init__()
 
         self.version = "1.0.0"
         self._get_updates()
 
-        self.format = ""
-        self.placeholder = ""
-        self.idle = ""
-        self.invisible = False
-        self.romaji = False
-        self.offset = 0
-
         self.pulsoid_connector = PulsoidConnector()
-        self.pulsoid_enabled = False
-        self.pulsoid_text = ""
 
         self.spotify_enabled = False
+        self.spotify_tokens = None
+        self.spotify_playback = SpotifyPlayback(self._spotify_token)
         self.spotify_client_id = ""
         self.spotify_client_secret = ""
         self.spotify_redirect_uri = ""
 
         self.osc_host = "127.0.0.1"
         self.osc_port = 9000
+        self.osc_resend_interval = 10.0
+        self.avatar_enabled = False
+        self.avatar_parameter_names = {"progress": "NekoProgress", "hr": "NekoHeartRate", "playing": "NekoPlaying"}
 
-        self.osc = VRCClient(self.osc_host, self.osc_port)
+        self.osc_targets = ""
 
         self.app_lock = ""
+        self.media_source_name = "winrt"
 
         self.console_output = None
 
@@ -165,9 +84,12 @@ class NekoOSC(QWidget):
         self.setWindowIcon(QIcon(icon_path))
 
         self.worker = Worker(self)
+        self.shown_status = self.worker.status
         self.worker.start()
-        self.worker.signals.data_updated.connect(self.update_data_display)
+        self.worker.signals.status_updated.connect(self.update_status)
         self.worker.signals.error.connect(self.handle_error)
+        self.worker.signals.config_value.connect(self.save_config_value)
+        self.pulsoid_connector.add_listener(self.worker.on_heart_rate)
 
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_data_display_timer)
@@ -178,35 +100,10 @@ class NekoOSC(QWidget):
         self.topmost_enabled = False
 
         self.nekooscpath = os.path.join(os.getenv('LOCALAPPDATA'), 'Nekoware', 'NekoOSC')
-
-        self.songname = ""
-        self.lyrics = ""
-        self.lyricnumber = 0
-        self.totallyrics = 0
-        self.firstrun = True
-
-        self.data = {
-            "title": "",
-            "artist": "",
-            "duration": "",
-            "totalduration": "",
-            "lyrics": "",
-        }
-
-        self.durationlock = False
-        self.started = False
-        self.is_playing = False
-        self.hrformat = self.format + "\n" + self.pulsoid_text
-
-        self.kakasi = pykakasi.kakasi()
-
-        self.tasks = []
-        self.ended = True
-        self.starttime = 0
-
-        asyncio.run(self._setup_manager())
-
-        self.pt = ""
+        self.lyrics_cache = LyricsCache(os.path.join(self.nekooscpath, "lyrics.db"))
+        self.lyrics_resolver = LyricsResolver(self.lyrics_cache)
+        self.lyrics_resolver.register("MusixMatch", self.mm.findLyrics)
+        self.lyrics_order = ["MusixMatch", "NetEase"]
 
         self.status_strings = {"lastrun": 0}
 
@@ -254,42 +151,51 @@ class NekoOSC(QWidget):
         for animation in self.animator.animation_list:
             self.animations[animation.name] = animation
 
+    async def _spotify_token(self):
+        """Return a Spotify access token from the token manager shared with the playback poller."""
+        if self.spotify_tokens is None:
+            raise RuntimeError("Spotify is not set up")
+        return await self.spotify_tokens.token()
+
     def setup_spotify(self):
-        """Set up the Spotify API."""
+        """Set up the Spotify token manager; the browser authorization only runs when there is no saved token."""
         try:
             if self.spotify_enabled:
-                self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+                oauth = SpotifyOAuth(
                     client_id=self.spotify_client_id,
                     client_secret=self.spotify_client_secret,
                     redirect_uri=self.spotify_redirect_uri,
-                    scope="user-read-playback-state"
-                ))
+                    scope="user-read-playback-state",
+                    cache_handler=spotipy.MemoryCacheHandler()
+                )
+                if self.spotify_tokens is not None and self.worker.loop is not None:
+                    self.worker.loop.call_soon_threadsafe(self.spotify_tokens.stop)
+                self.spotify_tokens = SpotifyTokens(self.spotify_client_id, self.spotify_client_secret,
+                                                    os.path.join(self.nekooscpath, "spotify_token.json"),
+                                                    authorize=oauth.get_access_token)
         except spotipy.oauth2.SpotifyOauthError:
             Logger.error("Spotify authentication failed. Please check your credentials in the config.")
             self.spotify_enabled = False
 
-    async def _setup_manager(self):
-        """Set up the media manager."""
-        self.manager = await MediaManager.request_async()
-
     async def _refesh_animations(self):
         """Refresh the animations."""
         self.animator.load_animations()
 
     async def setup_pulsoid(self):
-        """Set up the Pulsoid connector."""
+        """Set up the Pulsoid connector; runs on the worker loop, so the token is saved by the GUI thread."""
         if self.pulsoid_enabled:
             try:
-                with open(f"{self.nekooscpath}\\config.json", "r", encoding="utf-8") as f:
-                    js = json.load(f)
-                    js["pulsoid"]["Token"] = self.pulsoid_connector.return_access_token()
-                with open(f"{self.nekooscpath}\\config.json", "w", encoding="utf-8") as f:
-                    json.dump(js, f, indent=4, separators=(',', ': '))
-
                 await self.pulsoid_connector.start_pulsoid()
+                token = self.pulsoid_connector.return_access_token()
+                if token and token != self.pulsoid_token:
+                    self.worker.signals.config_value.emit("pulsoid.Token", token)
             except Exception as e:
                 Logger.error(f"Pulsoid setup error: {str(e)}")
 
+    def save_config_value(self, key, value):
+        """Save a setting through the config tab's ConfigurationManager, keeping its copy of the config current."""
+        self.config_tabs.config_manager.set_value(key, value)
+
     def initUI(self):
         """Initialize the user interface."""
         self.setWindowTitle("NekoOSC ⋆⭒˚｡⋆")
@@ -565,10 +471,10 @@ class NekoOSC(QWidget):
         vis_layout.addWidget(self.chatbox_widget, alignment=Qt.AlignmentFlag.AlignCenter)
         vis_tab.setLayout(vis_layout)
 
-        config_tabs = ConfigTabs(self.nekooscpath, self)
+        self.config_tabs = ConfigTabs(self.nekooscpath, self)
 
         right_panel.addTab(vis_tab, "VISUALIZER")
-        right_panel.addTab(config_tabs, "CONFIG")
+        right_panel.addTab(self.config_tabs, "CONFIG")
         animations_tab = AnimationsTab(self.animator)
         right_panel.addTab(animations_tab, "ANIMATIONS")
 
@@ -788,10 +694,25 @@ class NekoOSC(QWidget):
         """Handle mouse release events."""
         self.dragging = False
 
+    def _update_avatar_parameters(self):
+        """Point the avatar parameter stream at the configured parameter names."""
+        names = self.avatar_parameter_names
+        self.worker.parameters.set_parameters([
+            AvatarParameter(names["progress"], self.playback_progress, quantum=1 / 255),
+            AvatarParameter(names["hr"], lambda: int(self.pulsoid_connector.get_latest_heart_rate(max_time=5))
+                            if self.pulsoid_enabled else 0),
+            AvatarParameter(names["playing"], lambda: bool(self.is_playing)),
+        ])
+
+    def osc_targets_list(self):
+        """Return the OSC Host/Port target followed by the extra OSC Targets."""
+        return [(self.osc_host, int(self.osc_port))] + parse_targets(self.osc_targets)
+
     def _update_vrcclient(self):
         """Update the VRC client with the new host and port."""
         try:
-            self.osc = VRCClient(self.osc_host, int(self.osc_port))
+            self.osc.set_targets(self.osc_targets_list())
+            self.osc.resend_interval = self.osc_resend_interval
             self.hostlabel.setText("Host: " + self.osc_host)
             self.portlabel.setText("Port: " + str(self.osc_port))
         except AttributeError:
@@ -804,51 +725,38 @@ class NekoOSC(QWidget):
             self.start_btn.setText("STOP")
             self.worker.start_processing()
             if self.pulsoid_enabled:
-                QTimer.singleShot(0, self._deferred_pulsoid_setup)
+                self.worker.submit(self.setup_pulsoid())
         else:
             self.start_btn.setText("START")
             self.worker.stop_processing()
-            self.data_display.setText("")
-            self.osc.send_message("")
-
-    def _deferred_pulsoid_setup(self):
-        """Defer pulsoid setup to avoid blocking the main thread."""
-        asyncio.run(self.setup_pulsoid())
+            self.worker.clear_chatbox()
 
     def update_data_display_timer(self):
         """Update the data display."""
-        self.update_data_display()
-
-    def update_data_display(self):
-        """Update the data display with the current song information."""
-        if self.idle and not self.is_playing:
-            return
-        formatted_message = Formatter.format(self)
-        wrapped = self.wrap_text(formatted_message, 38)
-        if self.invisible:
-            wrapped = wrapped[:-1]
-        self.data_display.setText(wrapped)
-
-        self.data_display.adjustSize()
-        self.chatbox_widget.adjustSize()
-
-    def wrap_text(self, text, max_chars_per_line):
-        """Wrap text to fit within the specified number of characters per line."""
-        lines = text.splitlines()
-        wrapped_lines = []
-
-        for line in lines:
-            words = line.split()
-            current_line = ""
-            for word in words:
-                if len(current_line + word) + 1 <= max_chars_per_line:
-                    current_line += word + " "
-                else:
-                    wrapped_lines.append(current_line.strip())
-                    current_line = word + " "
-            wrapped_lines.append(current_line.strip())
-
-        return "\n".join(wrapped_lines)
+        self.update_status(self.worker.status)
+
+    def update_status(self, status):
+        """Apply the worker's UI status, touching only the widgets whose value changed."""
+        shown = self.shown_status
+        if status.preview != shown.preview:
+            self.data_display.setText(status.preview)
+            self.data_display.adjustSize()
+            self.chatbox_widget.adjustSize()
+        if status.connection != shown.connection:
+            self.connection_status.setText(status.connection)
+        if status.last_update != shown.last_update:
+            self.lastrunlabel.setText(status.last_update)
+        self.shown_status = status
+
+    def closeEvent(self, event):
+        """Stop the worker, which closes the keep-alive HTTP sessions, before the window goes away."""
+        self.worker.stop()
+        super().closeEvent(event)
+
+    async def close_sessions(self):
+        """Close the keep-alive HTTP sessions of the lyrics and Spotify clients; called when the worker stops."""
+        await self.mm.close()
+        await self.spotify_playback.close()
 
     def handle_error(self, error_message):
         """Handle errors that occur in the worker thread."""
@@ -887,23 +795,51 @@ class NekoOSC(QWidget):
             "pulsoid": {
                 "Enabled": False,
                 "Text": "*heartrate:$hr",
-                "Token": ""
+                "Token": "",
+                "Window (seconds)": 60,
+                "Max HR": 190,
+                "Wake Delta": 3
             },
             "spotify": {
                 "Enabled": False,
                 "Client ID": "",
                 "Client Secret": "",
-                "Redirect URI": ""
+                "Redirect URI": "",
+                "API URL": "https://api.spotify.com/v1",
+                "Poll Interval": 2.0
             },
             "OSC": {
                 "Host": "127.0.0.1",
-                "Port": 9000
+                "Port": 9000,
+                "Targets": "",
+                "Resend Interval": 10.0,
+                "Rate Limit": 1.0,
+                "Burst": 3,
+                "Listen Port": 0,
+                "Silence Timeout": 0
+            },
+            "avatar": {
+                "Enabled": False,
+                "Rate": 10.0,
+                "Progress": "NekoProgress",
+                "Heart Rate": "NekoHeartRate",
+                "Playing": "NekoPlaying"
             },
             "config": {
-                "App Lock": ""
+                "App Lock": "",
+                "Media Source": "winrt",
+                "Min Interval": 1.5,
+                "Keepalive": 3.0,
+                "Idle Interval": 5.0,
+                "UI FPS": 10
             },
             "lyrics": {
-                "NetEase": False
+                "NetEase": False,
+                "Order": "MusixMatch, NetEase",
+                "Cache": True,
+                "Cache TTL": 168,
+                "Negative TTL": 24,
+                "Cache Size": 50
             }
         }
         with open(config_path, "w", encoding="utf-8") as f:
@@ -920,25 +856,67 @@ class NekoOSC(QWidget):
                 self.idle = config["text"]["Idle"]
                 self.invisible = config["text"]["Invisible"]
                 self.romaji = config["text"]["Romaji"]
-                self.offset = config["text"]["Offset"]
+                try:
+                    self.offset = int(float(config["text"]["Offset"]))
+                except (TypeError, ValueError, OverflowError):
+                    self.offset = 0
 
                 self.pulsoid_enabled = config["pulsoid"]["Enabled"]
                 self.pulsoid_text = config["pulsoid"]["Text"]
                 self.pulsoid_token = config["pulsoid"]["Token"]
+                self.pulsoid_connector.store.window.window = float(config["pulsoid"].get("Window (seconds)", 60))
+                self.pulsoid_connector.store.window.max_hr = int(config["pulsoid"].get("Max HR", 190))
+                self.worker.heart_rate_delta = int(config["pulsoid"].get("Wake Delta", 3))
 
                 self.spotify_enabled = config["spotify"]["Enabled"]
                 self.spotify_client_id = config["spotify"]["Client ID"]
                 self.spotify_client_secret = config["spotify"]["Client Secret"]
                 self.spotify_redirect_uri = config["spotify"]["Redirect URI"]
+                self.spotify_playback.base_url = config["spotify"].get("API URL", SpotifyPlayback.BASE_URL).rstrip("/")
+                self.spotify_playback.ttl = float(config["spotify"].get("Poll Interval", 2.0))
 
                 self.osc_host = config["OSC"]["Host"]
                 self.osc_port = int(config["OSC"]["Port"])
+                self.osc_targets = config["OSC"].get("Targets", "")
+                self.osc_resend_interval = float(config["OSC"].get("Resend Interval", 10.0))
+                self.worker.sender.bucket.rate = float(config["OSC"].get("Rate Limit", 1.0))
+                self.worker.sender.bucket.capacity = float(config["OSC"].get("Burst", 3))
+                listen_port = int(config["OSC"].get("Listen Port", 0))
+                if listen_port and not all(is_loopback(host) for host, _ in self.osc_targets_list()):
+                    Logger.warning("Listen Port ignored: VRChat on another machine does not send its OSC here")
+                    listen_port = 0
+                self.worker.listener.port = listen_port
+                self.worker.listener.timeout = float(config["OSC"].get("Silence Timeout", 0))
+
+                avatar = config.get("avatar", {})
+                self.avatar_enabled = avatar.get("Enabled", False)
+                self.worker.parameters.rate = float(avatar.get("Rate", 10.0))
+                self.avatar_parameter_names = {
+                    "progress": avatar.get("Progress", "NekoProgress"),
+                    "hr": avatar.get("Heart Rate", "NekoHeartRate"),
+                    "playing": avatar.get("Playing", "NekoPlaying"),
+                }
 
                 self.app_lock = config["config"]["App Lock"]
+                self.media_source_name = config["config"].get("Media Source", "winrt")
+                self.worker.scheduler.min_interval = float(config["config"].get("Min Interval", 1.5))
+                self.worker.scheduler.keepalive = float(config["config"].get("Keepalive", 3.0))
+                self.worker.scheduler.idle_interval = float(config["config"].get("Idle Interval", 5.0))
+                self.worker.ui_fps = float(config["config"].get("UI FPS", 10))
 
                 self.netease = config["lyrics"]["NetEase"]
+                self.lyrics_order = [name.strip() for name in
+                                     config["lyrics"].get("Order", "MusixMatch, NetEase").split(",") if name.strip()]
+                self.lyrics_cache.enabled = config["lyrics"].get("Cache", True)
+                self.lyrics_cache.ttl = int(config["lyrics"].get("Cache TTL", 168)) * 3600
+                self.lyrics_cache.negative_ttl = int(config["lyrics"].get("Negative TTL", 24)) * 3600
+                self.lyrics_cache.max_size = int(config["lyrics"].get("Cache Size", 50)) * 1024 * 1024
             f.close()
             self._update_vrcclient()
+            self._update_lyrics_resolver()
+            self._update_avatar_parameters()
+            self._update_media_source()
+            Formatter.compile(self)
         except KeyError as e:
             Logger.error(f"Error loading config: {e}")
 
@@ -973,315 +951,48 @@ class NekoOSC(QWidget):
                 except OSError as open_error:
                     Logger.error(f"Error opening config folder: {open_error}")
             self._create_default_config(config_path)
-
-    async def _get_media_info(self):
-        """Retrieve the current media info from the system."""
-        try:
-            current_session = self.manager.get_current_session()
-            if current_session and self.app_lock and current_session.source_app_user_model_id == self.app_lock:
-                info = await current_session.try_get_media_properties_async()
-                playback = current_session.get_playback_info()
-                timeline = current_session.get_timeline_properties()
-
-                timeline_dict = {attr: getattr(timeline, attr) for attr in dir(timeline) if not attr.startswith('_')}
-                playback_dict = {attr: getattr(playback, attr) for attr in dir(playback) if not attr.startswith('_')}
-                info_dict = {attr: getattr(info, attr) for attr in dir(info) if not attr.startswith('_')}
-
-                maxdur = TimeUtils.seconds_to_m_s(TimeUtils.format_timespan(timeline_dict["end_time"]) // 1000)
-                info_dict["duration"] = maxdur
-                return info_dict, playback_dict, timeline_dict
-            elif current_session:
-                info = await current_session.try_get_media_properties_async()
-                playback = current_session.get_playback_info()
-                timeline = current_session.get_timeline_properties()
-
-                timeline_dict = {attr: getattr(timeline, attr) for attr in dir(timeline) if not attr.startswith('_')}
-                playback_dict = {attr: getattr(playback, attr) for attr in dir(playback) if not attr.startswith('_')}
-                info_dict = {attr: getattr(info, attr) for attr in dir(info) if not attr.startswith('_')}
-
-                maxdur = TimeUtils.seconds_to_m_s(TimeUtils.format_timespan(timeline_dict["end_time"]) // 1000)
-                info_dict["duration"] = maxdur
-                return info_dict, playback_dict, timeline_dict
-            return None, None, None
-        except Exception as e:
-            Logger.error(f"Media info error: {str(e)}")
-            return None, None, None
-
-    async def _update_song_info(self, song_info, playback_info, timeline_info):
-        """Update song and playback information, including lyrics and sync."""
-        try:
-            position = TimeUtils.format_timespan(timeline_info["position"])
-            self.is_playing = playback_info["playback_status"] == 4
-            song = Song(song_info)
-            if self.songname != song.title:
-                self.firstrun = True
-                self.duration = 0
-                self.totalduration = TimeUtils.time_to_ms(song.duration)
-                self.songname = song.title
-                self.lyrics = await self.mm.findLyrics(song)
-                try:
-                    if self.lyrics["error"] or len(self.lyrics) <= 1:
-                        if self.netease:
-                            Logger.error(f"Lyrics error: {self.lyrics['error']}, trying NetEase.")
-                            self.lyrics = await self.ne.find_lyrics(song)
-                except TypeError:
-                    pass
-                Logger.info(f"Fetched lyrics: {self.lyrics}")
-                self.lyricnumber = 0
-                self.totallyrics = len(self.lyrics) if self.lyrics else 0
-
-            if not self.durationlock:
-                self.duration = position // 1000
-                self.durationlock = True
-
-            if not self.is_playing:
-                self._reset_media_state()
-                self._process_stopped_state()
-
-            if self.is_playing:
-                self._process_playing_state(position, song)
-        except Exception as e:
-            Logger.error(f"Update song info error: {str(e)}")
-
-    async def _update_song_info_spotify(self, song_info):
-        """Update song and playback information, including lyrics and sync."""
-        try:
-            current_track = self.sp.current_playback()
-            position = current_track['progress_ms'] * 1000
-            self.is_playing = current_track['is_playing']
-            if current_track:
-                track_uri = current_track['item']['uri']
-                song = Song(song_info, track_uri)
-            else:
-                Logger.warning("No track is currently playing.")
-                return
-
-            if self.songname != song.title:
-                self.firstrun = True
-                self.duration = 0
-                self.songname = song.title
-                self.totalduration = TimeUtils.time_to_ms(song.duration)
-                self.lyrics = await self.mm.findLyrics(song)
-                try:
-                    if self.lyrics["error"] and self.netease:
-                        Logger.error(f"Lyrics error: {self.lyrics['error']}, trying NetEase.")
-                        self.lyrics = await self.ne.find_lyrics(song, self.romaji)
-                except TypeError:
-                    pass
-                Logger.info(f"Fetched lyrics: {self.lyrics}")
-                self.lyricnumber = 0
-                self.totallyrics = len(self.lyrics) if self.lyrics else 0
-
-            if not self.durationlock:
-                self.duration = position // 1000
-                self.durationlock = True
-
-            if not self.is_playing:
-                self._reset_media_state()
-                self._process_stopped_state()
-
-            if self.is_playing:
-                self._process_playing_state(position, song)
-        except Exception as e:
-            Logger.error(f"Update song (spotify) info error: {str(e)}")
-
-    def _reset_media_state(self):
-        """Reset the state when media is paused or stopped."""
-        self.started = False
-        self.durationlock = False
-        Logger.debug("Media state reset.")
-
-    def _process_stopped_state(self):
-        if self.pulsoid_enabled:
-            heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
-            if heartrate:
-                Logger.debug(f"Got heartrate | {heartrate}")
-                self.pt = self.pulsoid_text.replace("$hr", str(heartrate))
-            else:
-                self.pt = ""
-
-    def _process_playing_state(self, position, song):
-        """Process the playing state to update song and lyrics info."""
-        self.starttime = time.perf_counter()
-        formatted_duration = TimeUtils.unformat_timespan(self.duration)
-        sync_difference = abs(position - formatted_duration)
-        if sync_difference >= 4000:
-            logger.warning(
-                f"Duration is off by {sync_difference}, resyncing {TimeUtils.unformat_timespan(self.duration)} | {position} ")
-            if self.spotify_enabled:
-                current_playback = self.sp.current_playback()
-                if current_playback and current_playback['is_playing']:
-                    current_position_ms = current_playback['progress_ms']
-                    current_position_sec = current_position_ms * 0.001
-                    self.duration = current_position_sec
-                    self.firstrun = True
-            else:
-                Logger.warning(f"Duration is off by {sync_difference}, resyncing")
-                self.duration = position // 1000
-                self.firstrun = True
-
+            self._update_lyrics_resolver()
+            self._update_media_source()
+            Formatter.compile(self)
+
+    def _update_media_source(self):
+        """Switch media source when the Media Source setting (or the Spotify app lock) changed.
+
+        ``replay:<path>`` plays a scripted timeline file and ``mpris[:<bus name>]`` reads an MPRIS player.
+        """
+        kind, _, argument = self.media_source_name.partition(":")
+        kind = kind.strip().lower() or "winrt"
+        if kind == "winrt" and self.spotify_enabled and self.app_lock:
+            kind = "spotify"
+        key = (kind, argument.strip())
+        if getattr(self, "_media_source_key", None) == key:
+            return
         try:
-            if self.lyrics["error"]:
-                end_time = time.perf_counter()
-                elapsed_time = end_time - self.starttime
-
-                if self.spotify_enabled and self.app_lock:
-                    current_duration = self.sp.current_playback()['progress_ms']
-                    self.duration = current_duration * 0.001
-                else:
-                    increment = 1.5 + round(elapsed_time, 2)
-                    self.duration += increment
-                Logger.debug(f"{position} || {self.duration} || {TimeUtils.unformat_timespan(self.duration)}")
-                self.data = {
-                    "title": song.title,
-                    "artist": song.artist,
-                    "duration": TimeUtils.seconds_to_m_s(self.duration),
-                    "totalduration": song.duration,
-                    "lyrics": self.placeholder,
-                }
-                if self.pulsoid_enabled:
-                    heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
-                    if heartrate:
-                        Logger.debug(f"Got heartrate | {heartrate}")
-                        self.data["hr"] = heartrate
-                Logger.debug(f"_process_playing_state completed in {elapsed_time:.4f} seconds")
-                self.lastrunlabel.setText(f"Last Update Time: {datetime.now().strftime('%H:%M:%S')}")
-        except TypeError:
-            if self.spotify_enabled and self.app_lock:
-                self._update_lyrics_spotify(position, song)
+            if kind == "replay":
+                source = ReplaySource(argument.strip())
+            elif kind == "mpris":
+                source = MprisSource(argument.strip() or None)
+            elif kind == "spotify":
+                source = SpotifySource(self.spotify_playback)
             else:
-                self._update_lyrics(position, song)
-
-    def _update_lyrics(self, position, song):
-        """Update the lyrics based on the current playback position."""
-        self.ended = len(self.lyrics)
-        end_time = time.perf_counter()
-        elapsed_time = end_time - self.starttime
-        increment = 1.5 + round(elapsed_time, 2)
-        self.duration += increment
-        if self.lyricnumber >= self.ended:
+                source = WinRTSource()
+        except (OSError, ValueError) as e:
+            Logger.error(f"Media source error: {str(e)}")
             return
-        try:
-            currentlyrics = self.lyrics[self.lyricnumber]
-            starttime = currentlyrics["startTime"]
-            if self.firstrun and starttime + int(self.offset) >= TimeUtils.unformat_timespan(self.duration):
-                self.data["lyrics"] = self.placeholder
-            currentlyrics = self.lyrics[self.lyricnumber]
-            starttime = currentlyrics["startTime"]
-            Logger.debug(
-                f"{starttime} || {position} || {self.duration} || {TimeUtils.unformat_timespan(self.duration)}")
-            if self.firstrun and starttime + int(self.offset) <= TimeUtils.unformat_timespan(self.duration):
-                self.started = True
-                nearest_index = min(
-                    range(len(self.lyrics)),
-                    key=lambda i: abs(int(self.lyrics[i]['startTime']) - TimeUtils.unformat_timespan(self.duration))
-                )
-                nearest_dict = self.lyrics[nearest_index]
-                self.data["lyrics"] = nearest_dict["text"]
-                self.lyricnumber = nearest_index
-                self.firstrun = False
-            elif starttime + int(self.offset) <= TimeUtils.unformat_timespan(self.duration) and not self.firstrun:
-                self.started = True
-                self.lyricnumber += 1
-                self.data["lyrics"] = currentlyrics["text"]
-
-            self.data["title"] = song.title
-            self.data["artist"] = song.artist
-            self.data["duration"] = TimeUtils.seconds_to_m_s(self.duration)
-            self.data["totalduration"] = song.duration
-
-            if self.data["lyrics"] == "":
-                self.data["lyrics"] = self.placeholder
-
-            if self.contains_japanese(self.data["lyrics"]) and self.romaji:
-                result = self.kakasi.convert(self.data["lyrics"])
-                romaji_text = " ".join([item['hepburn'] for item in result])
-                self.data["lyrics"] = romaji_text
-                Logger.info(f"Converted lyrics to Romaji: {romaji_text}")
-            end_time = time.perf_counter()
-            elapsed_time = end_time - self.starttime
-
-            if self.pulsoid_enabled:
-                heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
-                if heartrate:
-                    Logger.debug(f"Got heartrate | {heartrate}")
-                    self.data["hr"] = heartrate
-            Logger.debug(f"_update_lyrics completed in {elapsed_time:.4f} seconds")
-            self.lastrunlabel.setText(f"Last Update Time: {datetime.now().strftime('%H:%M:%S')}")
-        except Exception as e:
-            tb = traceback.format_exc()
-            Logger.error(f"Error in _update_lyrics: {e}\n{tb}")
-
-    def _update_lyrics_spotify(self, position, song):
-        """Update the lyrics based on the current playback position."""
-        current_playback = self.sp.current_playback()
-        self.ended = len(self.lyrics)
-        if self.lyricnumber == self.ended:
-            if current_playback:
-                current_position_ms = current_playback['progress_ms']
-                current_position_sec = current_position_ms * 0.001
-                self.duration = current_position_sec
-                return
-        if current_playback and current_playback['is_playing']:
-            current_position_ms = current_playback['progress_ms']
-            current_position_sec = current_position_ms * 0.001
-            self.duration = current_position_sec
-        try:
-            currentlyrics = self.lyrics[self.lyricnumber]
-            starttime = int(currentlyrics["startTime"])
-            Logger.debug(
-                f"{str(starttime)} || {position} || {self.duration} || {TimeUtils.unformat_timespan(self.duration)}")
-            if self.firstrun and starttime - int(self.offset) >= TimeUtils.unformat_timespan(self.duration):
-                self.data["lyrics"] = self.placeholder
-            currentlyrics = self.lyrics[self.lyricnumber]
-            starttime = currentlyrics["startTime"]
-            if self.firstrun and int(starttime) + int(self.offset) <= TimeUtils.unformat_timespan(self.duration):
-                self.started = True
-                nearest_index = min(
-                    range(len(self.lyrics)),
-                    key=lambda i: abs(int(self.lyrics[i]['startTime']) - TimeUtils.unformat_timespan(self.duration))
-                )
-                nearest_dict = self.lyrics[nearest_index]
-                self.data["lyrics"] = nearest_dict["text"]
-                self.lyricnumber = nearest_index
-                self.firstrun = False
-            elif int(starttime) + int(self.offset) <= TimeUtils.unformat_timespan(self.duration) and not self.firstrun:
-                self.started = True
-                self.lyricnumber += 1
-                self.data["lyrics"] = currentlyrics["text"]
-
-            self.data["title"] = song.title
-            self.data["artist"] = song.artist
-            self.data["duration"] = TimeUtils.seconds_to_m_s(self.duration)
-            self.data["totalduration"] = song.duration
-
-            if self.data["lyrics"] == "":
-                self.data["lyrics"] = self.placeholder
-
-            if self.contains_japanese(self.data["lyrics"]) and self.romaji:
-                result = self.kakasi.convert(self.data["lyrics"])
-                romaji_text = " ".join([item['hepburn'] for item in result])
-                self.data["lyrics"] = romaji_text
-                Logger.info(f"Converted lyrics to Romaji: {romaji_text}")
-            end_time = time.perf_counter()
-            elapsed_time = end_time - self.starttime
-
-            if self.pulsoid_enabled:
-                heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
-                if heartrate:
-                    Logger.debug(f"Got heartrate | {heartrate}")
-                    self.data["hr"] = heartrate
-            Logger.debug(f"_update_lyrics_spotify completed in {elapsed_time:.4f} seconds")
-            self.lastrunlabel.setText(f"Last Update Time: {datetime.now().strftime('%H:%M:%S')}")
-        except Exception as e:
-            tb = traceback.format_exc()
-            Logger.error(f"Error in _update_lyrics: {e}\n{tb}")
-
-    @staticmethod
-    def contains_japanese(text):
-        """Check if the given text contains Japanese characters."""
-        japanese_pattern = re.compile(r'[\u3040-\u30FF\u4E00-\u9FFF]')
-        return bool(japanese_pattern.search(text))
+        old, self.media_source, self._media_source_key = self.media_source, source, key
+        if old is not None:
+            if self.worker.loop is not None:
+                self.worker.loop.call_soon_threadsafe(old.close)
+            else:
+                old.close()
+        Logger.info(f"Media source: {source.name}")
+
+    def _update_lyrics_resolver(self):
+        """Register the enabled lyrics providers in the configured preference order."""
+        self.lyrics_resolver.register("NetEase", lambda song: self.ne.find_lyrics(song, self.romaji),
+                                      "NetEase-romaji" if self.romaji else "NetEase")
+        enabled = {"MusixMatch": True, "NetEase": self.netease}
+        self.lyrics_resolver.order = [name for name in self.lyrics_order if enabled.get(name)]
 
 
 def main():
@@ -0,0 +1,18 @@
+from utils.clock import PlaybackClock
+
+
+def test_time_until_follows_the_drift_correction():
+    clock = PlaybackClock(correction_time=1000)
+    clock.reset(10000, True, now=0.0)
+    assert clock.time_until(12000, now=0.5) == 1.5
+    assert clock.update(10500, True, now=0.0 + 0.9) is None
+    for target in (11000, 11200, 11400, 13000):
+        wait = clock.time_until(target, now=1.0)
+        assert abs(clock.position(1.0 + wait) - target) < 1e-6
+    assert clock.time_until(9000, now=1.0) == 0.0
+
+
+def test_time_until_while_paused():
+    clock = PlaybackClock()
+    clock.reset(5000, False, now=0.0)
+    assert clock.time_until(6000, now=1.0) is None
@@ -0,0 +1,64 @@
+import asyncio
+import socket
+import time
+
+from utils.osc import OSCClient, OSCListener, VRCClient, is_loopback, parse_targets
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def test_listener_sleeps_after_silence_and_wakes_on_the_next_packet():
+    async def scenario():
+        woken = asyncio.Event()
+        listener = OSCListener(port=free_port(), timeout=0.3, on_packet=woken.set)
+        await listener.sync()
+        assert listener.error is None and listener.transport is not None
+        vrchat = OSCClient([("127.0.0.1", listener.port)])
+        try:
+            await vrchat.send_message("/avatar/parameters/VelocityX", [0.0])
+            await asyncio.sleep(0.05)
+            assert listener.packets == 1 and listener.alive()
+            assert not woken.is_set()
+
+            await asyncio.sleep(0.4)
+            assert not listener.alive()
+
+            sent = time.perf_counter()
+            await vrchat.send_message("/avatar/parameters/VelocityX", [0.0])
+            await asyncio.wait_for(woken.wait(), timeout=1)
+            assert time.perf_counter() - sent < 0.1
+            assert listener.packets == 2 and listener.alive()
+        finally:
+            vrchat.close()
+            listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_listener_without_a_socket_never_sleeps():
+    listener = OSCListener(port=0, timeout=0.1)
+    listener.last_packet -= 3600
+    assert listener.alive()
+
+
+def test_is_loopback():
+    assert is_loopback("127.0.0.1") and is_loopback("::1") and is_loopback("localhost")
+    assert not is_loopback("192.168.1.20") and not is_loopback("quest.local")
+
+
+def test_parse_targets_skips_malformed_entries():
+    assert parse_targets("127.0.0.1:9000, [::1]:9002, nohost, 10.0.0.2:70000, ") == [("127.0.0.1", 9000),
+                                                                                      ("::1", 9002)]
+
+
+def test_vrcclient_keeps_the_last_message_while_the_targets_are_unchanged():
+    client = VRCClient([("127.0.0.1", 9000)])
+    client.last_message = "hello"
+    client.set_targets([("127.0.0.1", 9000)])
+    assert client.last_message == "hello"
+    client.set_targets([("127.0.0.1", 9000), ("127.0.0.1", 9002)])
+    assert client.last_message is None
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from pythonosc.osc_message import OscMessage
+
+from utils.lyrics.cache import LyricsCache
+from utils.lyrics.resolver import LyricsResolver
+from utils.lyrics.sheet import LyricSheet
+from utils.media import ReplaySource, WinRTSource
+from utils.nekowidgets import Worker
+from utils.pipeline import ChatboxPipeline, Formatter
+
+SCRIPT = [
+    {"at": 0, "title": "Replay Song", "artist": "Neko", "duration": 180000, "position": 10000, "playing": True},
+    {"at": 60, "playing": False},
+]
+
+SHEET = LyricSheet([(0, "first line"), (9000, "second line"), (20000, "third line")])
+
+
+def test_replay_source_drives_the_chatbox_pipeline(tmp_path):
+    script = tmp_path / "replay.json"
+    script.write_text(json.dumps(SCRIPT), encoding="utf-8")
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.setblocking(False)
+    fetched = []
+
+    async def provider(song):
+        fetched.append(song.title)
+        return SHEET
+
+    pipeline = ChatboxPipeline()
+    pipeline.format = "$title - $artist\n$lyrics"
+    pipeline.media_source = ReplaySource(str(script))
+    pipeline.media_source.started = time.perf_counter()
+    pipeline.lyrics_resolver = LyricsResolver(LyricsCache(str(tmp_path / "lyrics.db")))
+    pipeline.lyrics_resolver.register("Test", provider)
+    pipeline.lyrics_resolver.order = ["Test"]
+    pipeline.osc.set_targets([receiver.getsockname()])
+    Formatter.compile(pipeline)
+    worker = Worker(pipeline)
+    worker.start_processing()
+
+    async def scenario():
+        worker.sender.start()
+        try:
+            await worker.tick()
+            data = await asyncio.wait_for(asyncio.get_running_loop().sock_recv(receiver, 4096), timeout=2)
+            await worker.tick()
+            preview = worker.status.preview
+            worker.stop_processing()
+            worker.clear_chatbox()
+            await asyncio.sleep(0)
+        finally:
+            worker.sender.stop()
+            pipeline.osc.client.close()
+        return OscMessage(data), preview
+
+    try:
+        message, preview = worker.loop.run_until_complete(scenario())
+    finally:
+        worker.loop.close()
+        receiver.close()
+    assert message.address == "/chatbox/input"
+    assert message.params == ["Replay Song - Neko\nsecond line", True]
+    assert fetched == ["Replay Song"]
+    assert pipeline.songname == "Replay Song" and pipeline.totallyrics == 3 and pipeline.lyricnumber == 1
+    assert preview == "Replay Song - Neko\nsecond line"
+    assert worker.status.preview == "" and not worker.frame.is_playing
+
+
+def test_replay_source_follows_the_script(tmp_path):
+    script = tmp_path / "replay.json"
+    script.write_text(json.dumps(SCRIPT), encoding="utf-8")
+    source = ReplaySource(str(script))
+    fields, position = source._position(30)
+    assert fields["playing"] and position == 40000
+    fields, position = source._position(90)
+    assert not fields["playing"] and position == 70000
+    assert source._position(-1) is None
+
+
+def test_winrt_position_is_aged_by_its_last_update():
+    timeline = SimpleNamespace(last_updated_time=datetime.now(timezone.utc) - timedelta(seconds=4))
+    assert abs(time.perf_counter() - WinRTSource._sampled_at(timeline, 180000) - 4) < 0.1
+    stale = SimpleNamespace(last_updated_time=datetime.now(timezone.utc) - timedelta(days=1))
+    assert abs(time.perf_counter() - WinRTSource._sampled_at(stale, 180000)) < 0.1
@@ -0,0 +1,56 @@
+import asyncio
+
+from aiohttp import web
+
+from utils.spotify import SpotifyPlayback
+
+PLAYBACK = {"is_playing": True, "progress_ms": 1000,
+            "item": {"name": "Song", "uri": "spotify:track:1", "duration_ms": 180000, "artists": []}}
+
+
+def test_spotify_playback_shares_requests_and_waits_out_rate_limits():
+    hits = []
+    responses = []
+
+    async def player(request):
+        hits.append(request.headers["Authorization"])
+        await asyncio.sleep(0.05)
+        if responses:
+            return responses.pop(0)
+        return web.json_response(PLAYBACK)
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/v1/me/player", player)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        playback = SpotifyPlayback(lambda: "token", base_url=f"http://127.0.0.1:{port}/v1", ttl=0.3)
+        try:
+            results = await asyncio.gather(*(playback.current_playback() for _ in range(5)))
+            assert all(result == PLAYBACK for result in results)
+            assert len(hits) == 1 and playback.requests == 1
+
+            assert await playback.current_playback() == PLAYBACK
+            assert len(hits) == 1
+
+            await asyncio.sleep(0.35)
+            responses.append(web.Response(status=429, headers={"Retry-After": "0.5"}))
+            assert await playback.current_playback() == PLAYBACK
+            assert len(hits) == 2 and playback.failures == 1
+
+            await asyncio.sleep(0.2)
+            assert await playback.current_playback() == PLAYBACK
+            assert len(hits) == 2
+
+            await asyncio.sleep(0.4)
+            assert await playback.current_playback() == PLAYBACK
+            assert len(hits) == 3 and playback.failures == 0
+            assert hits == ["Bearer token"] * 3
+        finally:
+            await playback.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
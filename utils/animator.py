@@ -1,5 +1,6 @@
 import os
 import time
+from bisect import bisect_right
 import xml.etree.ElementTree as ET
 from typing import List, Union, Dict, Optional
 
@@ -17,48 +18,93 @@ class Frame:
 
 
 class Animation:
+    """An animation compiled at load time for O(log n) stateless frame lookups.
+
+    Percentage animations become sorted thresholds searched with bisect; duration animations become cumulative
+    frame offsets within one cycle, looked up against the shared animation clock (``EPOCH``), so every consumer
+    reading the same animation at the same moment sees the same frame.
+    """
+
+    EPOCH = time.monotonic()
+
     def __init__(self, animation_type: str, name: str, frames: List[Dict[str, Union[str, int]]]):
         self.type = animation_type
         self.name = name
         self.frames = [Frame(frame, animation_type) for frame in frames]
         self._current_frame_index = 0
-        self.last_updated = time.time()
         self.duration = len(self.frames) - 1
+        self._compile()
 
     def __str__(self):
         return f"{self.type, self.name, self.frames, self.duration}"
 
+    def _compile(self):
+        """Precompute the percentage thresholds (first frame wins among equal ones) or the duration offsets."""
+        self._thresholds: List[int] = []
+        self._threshold_frames: List[int] = []
+        self._offsets: List[int] = [0]
+        if self.type == "percentage":
+            for index in sorted(range(len(self.frames)), key=lambda i: self.frames[i].percentage):
+                if self._thresholds and self._thresholds[-1] == self.frames[index].percentage:
+                    continue
+                self._thresholds.append(self.frames[index].percentage)
+                self._threshold_frames.append(index)
+        elif self.type == "duration":
+            for frame in self.frames:
+                self._offsets.append(self._offsets[-1] + max(0, frame.duration or 0))
+        self.cycle = self._offsets[-1]
+
     @property
     def current_frame(self) -> Frame:
         return self.frames[self._current_frame_index]
 
+    @staticmethod
+    def clock() -> float:
+        """Milliseconds on the animation clock shared by every animation."""
+        return (time.monotonic() - Animation.EPOCH) * 1000
+
+    def frame_index(self, percentage: float) -> int:
+        """Return the index of the frame a percentage animation shows at ``percentage``, without advancing it."""
+        position = bisect_right(self._thresholds, percentage) - 1
+        return self._threshold_frames[position] if position >= 0 else 0
+
+    def frame_index_at_time(self, now: Optional[float] = None) -> int:
+        """Return the index of the frame a duration animation shows at ``now`` ms on the animation clock."""
+        if not self.cycle:
+            return 0
+        now = self.clock() if now is None else now
+        return min(bisect_right(self._offsets, now % self.cycle) - 1, len(self.frames) - 1)
+
+    def frame_at_percent(self, percentage: float) -> Frame:
+        return self.frames[self.frame_index(percentage)]
+
+    def frame_at_time(self, now: Optional[float] = None) -> Frame:
+        return self.frames[self.frame_index_at_time(now)]
+
     def next_frame(self, percentage: int = 0) -> Frame:
-        """Advance to the next frame if the percentage reaches or exceeds the frame's percentage."""
+        """Move current_frame to the frame shown now (duration) or at ``percentage`` (percentage) and return it."""
         if self.type == "duration":
-            if time.time() - self.last_updated >= self.current_frame.duration / 1000:
-                self._current_frame_index = (self._current_frame_index + 1) % len(self.frames)
-                self.last_updated = time.time()
+            self._current_frame_index = self.frame_index_at_time()
         elif self.type == "percentage":
-            closest_frame_index = 0
-            closest_percentage_diff = float('inf')
-            found = False
-
-            for i in range(len(self.frames)):
-                frame_percentage = self.frames[i].percentage
-                if frame_percentage <= percentage:
-                    found = True
-                    percentage_diff = percentage - frame_percentage
-                    if percentage_diff < closest_percentage_diff:
-                        closest_percentage_diff = percentage_diff
-                        closest_frame_index = i
-
-            if not found:
-                self._current_frame_index = 0
-            else:
-                self._current_frame_index = closest_frame_index
+            self._current_frame_index = self.frame_index(percentage)
 
         return self.current_frame
 
+    def seconds_until_next_frame(self, now: Optional[float] = None) -> Optional[float]:
+        """Return how long the current frame of a duration animation still has to play."""
+        if self.type != "duration" or not self.cycle:
+            return None
+        now = self.clock() if now is None else now
+        offset = now % self.cycle
+        return (self._offsets[bisect_right(self._offsets, offset)] - offset) / 1000
+
+    def next_percentage(self, percentage: float) -> Optional[int]:
+        """Return the lowest frame percentage above ``percentage`` for a percentage animation."""
+        if self.type != "percentage":
+            return None
+        position = bisect_right(self._thresholds, percentage)
+        return self._thresholds[position] if position < len(self._thresholds) else None
+
 
 class NekoAnimator:
     def __init__(self, animator_path: str = "./"):
@@ -0,0 +1,98 @@
+import time
+from typing import Optional
+
+
+class PlaybackClock:
+    """Playback position interpolated from the last authoritative position sample.
+
+    Samples (WinRT timeline position, Spotify ``progress_ms``) anchor the clock; between samples the position
+    advances with ``time.perf_counter()``. Small drifts are absorbed gradually instead of making the position
+    jump, while discontinuities larger than ``seek_threshold`` are treated as seeks and applied at once.
+    """
+
+    SEEK = "seek"
+    PAUSE = "pause"
+    RESUME = "resume"
+
+    def __init__(self, seek_threshold: int = 2000, correction_time: int = 1000):
+        self.seek_threshold = seek_threshold
+        self.correction_time = correction_time
+        self.playing = False
+        self._anchor_position = 0.0
+        self._anchor_time = time.perf_counter()
+        self._error = 0.0
+        self._error_window = 0.0
+        self._last_sample = None
+
+    def reset(self, position_ms: float = 0, playing: bool = False, now: Optional[float] = None):
+        """Re-anchor the clock on a new track."""
+        self.playing = playing
+        self._anchor_position = float(position_ms)
+        self._anchor_time = time.perf_counter() if now is None else now
+        self._error = 0.0
+        self._error_window = 0.0
+        self._last_sample = (position_ms, playing)
+
+    def position(self, now: Optional[float] = None) -> float:
+        """Return the interpolated playback position in ms."""
+        if not self.playing:
+            return self._anchor_position
+        now = time.perf_counter() if now is None else now
+        elapsed = (now - self._anchor_time) * 1000
+        position = self._anchor_position + elapsed
+        if self._error:
+            position += self._error * min(1.0, elapsed / self._error_window)
+        return max(0.0, position)
+
+    def time_until(self, position_ms: float, now: Optional[float] = None) -> Optional[float]:
+        """Return the seconds until the clock reaches ``position_ms``, 0 if it already has, None while paused.
+
+        While a drift is being absorbed the clock runs at ``1 + error / window`` speed, so the wait is worked out
+        on the same piecewise timeline ``position`` uses rather than assuming 1x.
+        """
+        if not self.playing:
+            return None
+        now = time.perf_counter() if now is None else now
+        elapsed = (now - self._anchor_time) * 1000
+        distance = position_ms - self._anchor_position
+        target = distance - self._error
+        if self._error:
+            during = distance / (1 + self._error / self._error_window)
+            if during <= self._error_window:
+                target = during
+        return max(0.0, target - elapsed) / 1000
+
+    def seconds(self, now: Optional[float] = None) -> float:
+        return self.position(now) / 1000
+
+    def update(self, position_ms: float, playing: bool, now: Optional[float] = None) -> Optional[str]:
+        """Feed an authoritative sample and return SEEK, PAUSE, RESUME or None.
+
+        A sample identical to the previous one carries no new information (WinRT only refreshes its timeline on
+        player events), so it is ignored while the play state is unchanged.
+        """
+        now = time.perf_counter() if now is None else now
+        if self._last_sample == (position_ms, playing):
+            return None
+        self._last_sample = (position_ms, playing)
+
+        if playing != self.playing:
+            self.reset(position_ms, playing, now)
+            return self.RESUME if playing else self.PAUSE
+
+        if not playing:
+            moved = abs(position_ms - self._anchor_position) >= self.seek_threshold
+            self.reset(position_ms, playing, now)
+            return self.SEEK if moved else None
+
+        predicted = self.position(now)
+        error = position_ms - predicted
+        if abs(error) >= self.seek_threshold:
+            self.reset(position_ms, playing, now)
+            return self.SEEK
+
+        self._anchor_position = predicted
+        self._anchor_time = now
+        self._error = error
+        self._error_window = max(float(self.correction_time), abs(error) * 2)
+        return None
@@ -0,0 +1,34 @@
+import logging
+
+
+def print_to_console(text, color=None, app=None):
+    try:
+        if app and hasattr(app.neko_osc_widget, 'console_output') and app.neko_osc_widget.console_output is not None:
+            app.neko_osc_widget.console_output.new_text_signal.emit(text, color)
+        else:
+            print(text)
+    except AttributeError:
+        return
+
+
+class Logger:
+    @staticmethod
+    def log(level, message, raw, color=None):
+        logging.log(level, raw)
+        print_to_console(message, color)
+
+    @staticmethod
+    def info(message):
+        Logger.log(logging.INFO, "\n[INFO] " + message, "lightblue", message)
+
+    @staticmethod
+    def warning(message):
+        Logger.log(logging.WARNING, "\n[WARNING] " + message, "yellow", message)
+
+    @staticmethod
+    def error(message):
+        Logger.log(logging.ERROR, "\n[ERROR] " + message, "red", message)
+
+    @staticmethod
+    def debug(message):
+        Logger.log(logging.DEBUG, "\n[DEBUG] " + message, "lightgreen", message)
@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.lyrics.sheet import LyricSheet
+
+
+class LyricsCache:
+    """SQLite backed lyrics cache with TTL expiry and LRU eviction.
+
+    Entries are stored per provider so a negative result from one provider does not hide a hit from another.
+    Results are the LyricSheets/``{"error": ...}`` dicts the providers return; errors flagged as ``transient``
+    (network and server failures) are never stored.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, negative_ttl=24 * 3600, max_size=50 * 1024 * 1024, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lyrics (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                negative INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS lyrics_accessed_at ON lyrics (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def _normalize(value):
+        return re.sub(r"\s+", " ", str(value or "")).strip().casefold()
+
+    @staticmethod
+    def _duration_seconds(duration):
+        try:
+            minutes, seconds = map(int, str(duration).split(":"))
+            return minutes * 60 + seconds
+        except ValueError:
+            return 0
+
+    def key(self, provider, song):
+        """Build the cache key for a song, preferring its Spotify URI when there is one."""
+        if getattr(song, "uri", ""):
+            return f"{provider}|{song.uri}"
+        return "|".join((provider, self._normalize(song.artist), self._normalize(song.title),
+                         str(self._duration_seconds(getattr(song, "duration", "")))))
+
+    def get(self, provider, song):
+        """Return the cached result for a song or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        key = self.key(provider, song)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, negative, created_at FROM lyrics WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            payload, negative, created_at = row
+            if now - created_at > (self.negative_ttl if negative else self.ttl):
+                self._db.execute("DELETE FROM lyrics WHERE key = ?", (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE lyrics SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        payload = json.loads(payload)
+        if negative:
+            return payload
+        try:
+            return LyricSheet.from_dict(payload)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def put(self, provider, song, lyrics):
+        """Store a provider result, skipping transient errors."""
+        if not self.enabled or not lyrics:
+            return
+        negative = not isinstance(lyrics, LyricSheet)
+        if negative and lyrics.get("transient"):
+            return
+        payload = json.dumps(lyrics if negative else lyrics.to_dict(), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?, ?)",
+                             (self.key(provider, song), payload, int(negative), len(payload), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones until the cache fits in max_size."""
+        now = time.time()
+        self._db.execute("DELETE FROM lyrics WHERE (negative = 0 AND created_at < ?) OR (negative = 1 AND created_at < ?)",
+                         (now - self.ttl, now - self.negative_ttl))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM lyrics").fetchone()[0]
+        if total <= self.max_size:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM lyrics ORDER BY accessed_at").fetchall():
+            self._db.execute("DELETE FROM lyrics WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_size:
+                break
+
+    async def fetch(self, provider, song, fetch):
+        """Return the cached result for a song or await ``fetch(song)`` and store what it returns."""
+        lyrics = self.get(provider, song)
+        if lyrics is None:
+            lyrics = await fetch(song)
+            self.put(provider, song, lyrics)
+        return lyrics
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM lyrics")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
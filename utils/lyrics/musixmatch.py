@@ -1,9 +1,12 @@
-import requests
-import json
-import urllib
 import asyncio
+import json
 import os
 
+import aiohttp
+
+from utils.lyrics.sheet import LyricSheet
+from utils.session import KeepAliveSession
+
 
 class TokenError(Exception):
     def __init__(self, message="Token not found"):
@@ -48,81 +51,91 @@ class Song:
 
 
 class MusixMatch:
-    def __init__(self):
+    BASE_URL = "https://apic-desktop.musixmatch.com/ws/1.1/"
+
+    def __init__(self, timeout=10, retries=2):
         appdata_path = os.getenv('LOCALAPPDATA')
         self.nekooscpath = os.path.join(appdata_path, 'Nekoware', 'MusixMatch')
-        self.setup()
+        self.token_path = os.path.join(self.nekooscpath, "token.json")
         self.token = ""
-        self.gettoken()
+        self.retries = retries
         self.headers = {
             "authority": "apic-desktop.musixmatch.com",
             "cookie": "x-mxm-token-guid=",
         }
+        self.session = KeepAliveSession(timeout, limit=4, headers=self.headers)
+        self.setup()
 
     def setup(self):
-        if not os.path.exists(self.nekooscpath):
-            os.makedirs(self.nekooscpath)
-            with open(f"{self.nekooscpath}\\token.json", "w") as f:
-                f.write('{"token": ""}')
-                f.close()
-        else:
-            try:
-                with open(f"{self.nekooscpath}\\token.json", "r") as f:
-                    try:
-                        js = json.loads(f.read())
-                    except:
-                        os.remove(f"{self.nekooscpath}\\token.json")
-                        MusixMatch().setup()
-                    f.close()
-                if not js["token"]:
-                    os.remove(f"{self.nekooscpath}\\token.json")
-                    MusixMatch().setup()
-            except FileNotFoundError:
-                with open(f"{self.nekooscpath}\\token.json", "w") as f:
-                    f.write('{"token": ""}')
-                    f.close()
-
-    def gettoken(self):
-        with open(f"{self.nekooscpath}\\token.json", "r") as f:
-            js = json.loads(f.read())
-            f.close()
-        if js["token"] != "":
-            self.token = js["token"]
-        else:
-            url = "https://apic-desktop.musixmatch.com/ws/1.1/token.get?app_id=web-desktop-app-v1.0"
-            tokenrequest = requests.get(url)
+        """Create the token file if needed and load the saved token."""
+        os.makedirs(self.nekooscpath, exist_ok=True)
+        try:
+            with open(self.token_path, "r") as f:
+                self.token = json.loads(f.read()).get("token", "")
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            self._save_token("")
+
+    def _save_token(self, token):
+        with open(self.token_path, "w") as f:
+            f.write(json.dumps({"token": token}))
+
+    async def close(self):
+        await self.session.close()
+
+    async def _get(self, endpoint, params):
+        """GET an API endpoint, retrying timeouts, connection errors and 429/5xx responses with backoff."""
+        session = await self.session.get()
+        for attempt in range(self.retries + 1):
             try:
-                if tokenrequest.status_code == 200 and tokenrequest.json()["message"]["body"]["user_token"]:
-                    token = tokenrequest.json()["message"]["body"]["user_token"]
-                    self.token = token
-                    js["token"] = token
-                    with open(f"{self.nekooscpath}\\token.json", "w") as f:
-                        f.write(json.dumps(js))
-                        f.close()
-                else:
-                    raise TokenError("Could not get the token from the MusixMatch API.")
-            except KeyError:
-                raise TokenError("Could not get the token from the MusixMatch API.")
+                async with session.get(self.BASE_URL + endpoint, params=params) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                          status=response.status)
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def gettoken(self, refresh=False):
+        """Load the user token, requesting a new one from the API when missing or when refresh is set."""
+        if self.token and not refresh:
+            return self.token
+        body = await self._get("token.get", {"app_id": "web-desktop-app-v1.0"})
+        try:
+            token = body["message"]["body"]["user_token"]
+        except (KeyError, TypeError):
+            raise TokenError("Could not get the token from the MusixMatch API.")
+        if not token:
+            raise TokenError("Could not get the token from the MusixMatch API.")
+        self.token = token
+        self._save_token(token)
+        return token
 
     async def findLyrics(self, info: Song):
-        base_url = (
-            "https://apic-desktop.musixmatch.com/ws/1.1/macro.subtitles.get?format=json"
-            "&namespace=lyrics_richsynched&subtitle_format=mxm&app_id=web-desktop-app-v1.0&"
-        )
-        song = info.to_dict()
-        song["usertoken"] = self.token
-        query_string = "&".join(f"{key}={urllib.parse.quote_plus(str(value))}" for key, value in song.items())
-        request_url = base_url + query_string
-
-        response = requests.get(request_url, headers=self.headers)
-        body = response.json()
+        await self.gettoken()
+        params = {
+            "format": "json",
+            "namespace": "lyrics_richsynched",
+            "subtitle_format": "mxm",
+            "app_id": "web-desktop-app-v1.0",
+            **{key: str(value) for key, value in info.to_dict().items()},
+        }
+
+        params["usertoken"] = self.token
+        body = await self._get("macro.subtitles.get", params)
+        if body["message"]["header"]["status_code"] == 401:
+            params["usertoken"] = await self.gettoken(refresh=True)
+            body = await self._get("macro.subtitles.get", params)
         body = body["message"]["body"]["macro_calls"]
 
         # Check if track information exists and has a valid status code
         track_info = body.get("matcher.track.get", {}).get("message", {})
-        if track_info.get("header", {}).get("status_code") != 200:
+        status_code = track_info.get("header", {}).get("status_code")
+        if status_code != 200:
             return {
-                "error": f"Requested error: {track_info.get('header', {}).get('mode', 'unknown mode')} | {track_info.get('header', {}).get('status_code')}"
+                "error": f"Requested error: {track_info.get('header', {}).get('mode', 'unknown mode')} | {status_code}",
+                "transient": status_code != 404
             }
 
         # Check if track.lyrics.get has a body and handle if it's a list
@@ -148,7 +161,7 @@ class MusixMatch:
         is_instrumental = meta.get("track", {}).get("instrumental")
 
         if is_instrumental:
-            return [{"text": "♪ Instrumental ♪", "startTime": "0000"}]
+            return LyricSheet.instrumental_sheet()
 
         if has_synced:
             subtitle = (
@@ -161,9 +174,9 @@ class MusixMatch:
             if not subtitle:
                 return None
 
-            return [
-                {"text": line.get("text", "♪"), "startTime": line["time"]["total"] * 1000}
+            return LyricSheet(
+                (round(line["time"]["total"] * 1000), line.get("text", "♪"))
                 for line in json.loads(subtitle["subtitle_body"])
-            ]
+            )
 
         return None
@@ -3,9 +3,8 @@ import re
 from urllib.parse import quote
 
 import aiohttp
-import pykakasi
 
-kks = pykakasi.kakasi()
+from utils.lyrics.sheet import LyricSheet
 
 
 class NetEase:
@@ -24,7 +23,7 @@ class NetEase:
         async with aiohttp.ClientSession() as session:
             async with session.get(final_url, headers=self.request_header) as response:
                 if response.status != 200:
-                    return {"error": f"HTTP error {response.status}"}
+                    return {"error": f"HTTP error {response.status}", "transient": True}
                 search_results = await response.json()
         items = search_results.get("result", {}).get("songs", [])
         if not items:
@@ -34,7 +33,7 @@ class NetEase:
         async with aiohttp.ClientSession() as session:
             async with session.get(lyric_url + str(item_id), headers=self.request_header) as response:
                 if response.status != 200:
-                    return {"error": f"HTTP error {response.status}"}
+                    return {"error": f"HTTP error {response.status}", "transient": True}
                 lyrics_data = await response.json()
         return self._get_filtered_lyrics(lyrics_data, lyric_format)
 
@@ -51,7 +50,7 @@ class NetEase:
         return self._parse_lyrics(raw_lyrics)
 
     def _parse_lyrics(self, raw_lyrics):
-        lyrics_list = []
+        lines = []
 
         for line in raw_lyrics.split("\n"):
             if self.credit_info_regex.search(line):
@@ -65,9 +64,9 @@ class NetEase:
             milliseconds = int(milliseconds.ljust(3, "0")) if milliseconds else 0
             start_time = (int(minutes) * 60 + int(seconds)) * 1000 + milliseconds
 
-            lyrics_list.append({"text": text, "startTime": start_time})
+            lines.append((start_time, text))
 
-        return lyrics_list if lyrics_list else {"error": "No lyrics found"}
+        return LyricSheet(lines) if lines else {"error": "No lyrics found"}
 
 
 class Song:
@@ -82,9 +81,9 @@ async def main():
 
     lyrics = await provider.find_lyrics(song, lyric_format=False)
 
-    if isinstance(lyrics, list):
-        for lyric in lyrics:
-            print((lyric["text"]))
+    if isinstance(lyrics, LyricSheet):
+        for text in lyrics.texts:
+            print(text)
     else:
         print(lyrics["error"])
 
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import Counter
+
+from utils.lyrics.sheet import LyricSheet
+
+
+class LyricsResolver:
+    """Query the enabled lyrics providers concurrently and return the best-ranked synced result.
+
+    A result is returned as soon as the highest-ranked provider that can still win has answered with synced
+    lyrics; every provider still running at that point is cancelled.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.providers = {}
+        self.order = []
+        self.wins = Counter()
+        self.last_winner = None
+        self.last_latency = 0.0
+
+    def register(self, name, fetch, cache_name=None):
+        """Register (or replace) a provider coroutine ``fetch(song)`` under ``name``."""
+        self.providers[name] = (fetch, cache_name or name)
+
+    def store(self, name, song, lyrics):
+        """Write an updated result back to the cache entry of the provider that produced it."""
+        if self.cache is not None and name in self.providers:
+            self.cache.put(self.providers[name][1], song, lyrics)
+
+    @staticmethod
+    def is_valid(lyrics):
+        return isinstance(lyrics, LyricSheet) and len(lyrics) > 0
+
+    async def _fetch(self, name, song):
+        fetch, cache_name = self.providers[name]
+        try:
+            if self.cache is not None:
+                return await self.cache.fetch(cache_name, song, fetch)
+            return await fetch(song)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {"error": f"{name} error: {e}", "transient": True}
+
+    async def resolve(self, song):
+        """Return ``(lyrics, provider)`` for a song, or the top-ranked provider's error if none had lyrics."""
+        names = [name for name in self.order if name in self.providers]
+        if not names:
+            return {"error": "No lyrics providers enabled."}, None
+
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(self._fetch(name, song)): name for name in names}
+        pending = set(tasks)
+        results = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+
+                for name in names:
+                    if name not in results:
+                        break
+                    if self.is_valid(results[name]):
+                        self.wins[name] += 1
+                        self.last_winner = name
+                        self.last_latency = time.perf_counter() - started
+                        return results[name], name
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.last_winner = None
+        self.last_latency = time.perf_counter() - started
+        return results[names[0]], None
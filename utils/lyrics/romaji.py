@@ -0,0 +1,38 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from utils.lyrics.sheet import LyricSheet
+
+_kakasi = None
+_kakasi_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="romaji")
+
+
+def get_kakasi():
+    """Return the shared pykakasi converter, loading its dictionaries on first use."""
+    global _kakasi
+    if _kakasi is None:
+        with _kakasi_lock:
+            if _kakasi is None:
+                import pykakasi
+                _kakasi = pykakasi.kakasi()
+    return _kakasi
+
+
+@lru_cache(maxsize=4096)
+def romanize(text):
+    """Convert a single line to Hepburn romaji."""
+    return " ".join(item['hepburn'] for item in get_kakasi().convert(text))
+
+
+def romanize_sheet(sheet: LyricSheet):
+    """Return the romaji for every line of a sheet, leaving non-Japanese lines untouched."""
+    return tuple(romanize(text) if flags & LyricSheet.JAPANESE else text
+                 for text, flags in zip(sheet.texts, sheet.flags))
+
+
+async def romanize_sheet_async(sheet: LyricSheet):
+    """Return ``romanize_sheet(sheet)`` computed on the romaji worker thread, off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, romanize_sheet, sheet)
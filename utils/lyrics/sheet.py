@@ -0,0 +1,53 @@
+import re
+from array import array
+from typing import Iterable, Optional, Sequence, Tuple
+
+from utils.lyrics.timeline import LyricTimeline
+
+JAPANESE_PATTERN = re.compile(r'[\u3040-\u30FF\u4E00-\u9FFF]')
+
+
+class LyricSheet(LyricTimeline):
+    """Synced lyrics in the one shape every provider produces and every consumer reads.
+
+    Start and end times are ints in ms, texts are a tuple and per-line flags are precomputed, so the tick path
+    only indexes into arrays.
+    """
+
+    __slots__ = ("texts", "ends", "flags", "instrumental", "romaji")
+
+    JAPANESE = 1
+    EMPTY = 2
+    OPEN_END = 2 ** 63 - 1
+
+    def __init__(self, lines: Iterable[Tuple[int, str]], instrumental: bool = False,
+                 romaji: Optional[Sequence[str]] = None):
+        lines = sorted(((int(start), text or "") for start, text in lines), key=lambda line: line[0])
+        super().__init__(start for start, _ in lines)
+        self.texts = tuple(text for _, text in lines)
+        self.ends = array("q", self.starts[1:])
+        if lines:
+            self.ends.append(self.OPEN_END)
+        self.flags = bytes((self.JAPANESE if JAPANESE_PATTERN.search(text) else 0) |
+                           (0 if text.strip() else self.EMPTY) for text in self.texts)
+        self.instrumental = instrumental
+        self.romaji = tuple(romaji) if romaji is not None and len(romaji) == len(self.texts) else None
+
+    def __repr__(self):
+        return f"<LyricSheet {len(self)} lines{' (instrumental)' if self.instrumental else ''}>"
+
+    @classmethod
+    def instrumental_sheet(cls):
+        return cls([(0, "♪ Instrumental ♪")], instrumental=True)
+
+    def to_dict(self):
+        data = {"lines": [[start, text] for start, text in zip(self.starts, self.texts)],
+                "instrumental": self.instrumental}
+        if self.romaji is not None:
+            data["romaji"] = list(self.romaji)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(((start, text) for start, text in data["lines"]), data.get("instrumental", False),
+                   data.get("romaji"))
@@ -0,0 +1,24 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+
+class LyricTimeline:
+    """Lyric start times in ms as a sorted integer array, so a playback position maps to a line in O(log n)."""
+
+    __slots__ = ("starts",)
+
+    def __init__(self, starts: Iterable[int]):
+        self.starts = array("q", starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def index_at(self, position_ms: int) -> int:
+        """Return the index of the line playing at ``position_ms``, or -1 before the first line."""
+        return bisect_right(self.starts, position_ms) - 1
+
+    def next_start(self, position_ms: int) -> Optional[int]:
+        """Return the start time of the first line after ``position_ms``, or None after the last line."""
+        index = bisect_right(self.starts, position_ms)
+        return self.starts[index] if index < len(self.starts) else None
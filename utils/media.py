@@ -0,0 +1,264 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class MediaSnapshot:
+    """The fields of the current media session NekoOSC uses, read once per poll.
+
+    ``position`` is the playback position at ``sampled_at`` (a ``time.perf_counter()`` time), which may be well
+    before the poll when the player only reports its position on events.
+    """
+    __slots__ = ("title", "artist", "status", "position", "end_time", "source_app", "uri", "sampled_at")
+
+    STOPPED = 3
+    PLAYING = 4
+    PAUSED = 5
+
+    title: str
+    artist: str
+    status: int
+    position: int
+    end_time: int
+    source_app: str
+    uri: str
+    sampled_at: float
+
+    @property
+    def is_playing(self) -> bool:
+        return self.status == self.PLAYING
+
+    @property
+    def duration(self) -> str:
+        """The track length formatted as minutes:seconds."""
+        seconds = self.end_time // 1000
+        return f"{seconds // 60}:{seconds % 60:02}"
+
+
+class MediaSource(ABC):
+    """Where media snapshots come from. ``snapshot`` returns None when nothing is playing or paused."""
+
+    name = ""
+
+    @abstractmethod
+    async def snapshot(self) -> Optional[MediaSnapshot]:
+        ...
+
+    def close(self):
+        pass
+
+
+class WinRTSource(MediaSource):
+    """The current Windows media session (System Media Transport Controls)."""
+
+    name = "winrt"
+
+    def __init__(self):
+        self.manager = None
+
+    @staticmethod
+    def _ms(timespan) -> int:
+        """Convert a WinRT TimeSpan (100 ns ticks) to milliseconds."""
+        return int(timespan.duration * 0.0001)
+
+    @staticmethod
+    def _sampled_at(timeline, end_time: int) -> float:
+        """The perf_counter time the timeline position was taken at, from its LastUpdatedTime.
+
+        Players only refresh the timeline on events (play, pause, seek, track change), so the position can be
+        seconds old. An age that is negative or longer than the track is not trusted and the poll time is used.
+        """
+        now = time.perf_counter()
+        try:
+            age = time.time() - timeline.last_updated_time.timestamp()
+        except (AttributeError, OverflowError, OSError, ValueError):
+            return now
+        if 0 <= age <= end_time / 1000:
+            return now - age
+        return now
+
+    async def snapshot(self) -> Optional[MediaSnapshot]:
+        if self.manager is None:
+            from winrt.windows.media.control import GlobalSystemMediaTransportControlsSessionManager as MediaManager
+            self.manager = await MediaManager.request_async()
+        current_session = self.manager.get_current_session()
+        if not current_session:
+            return None
+        info = await current_session.try_get_media_properties_async()
+        timeline = current_session.get_timeline_properties()
+        end_time = self._ms(timeline.end_time)
+        return MediaSnapshot(
+            title=info.title,
+            artist=info.artist,
+            status=current_session.get_playback_info().playback_status,
+            position=self._ms(timeline.position),
+            end_time=end_time,
+            source_app=current_session.source_app_user_model_id,
+            uri="",
+            sampled_at=self._sampled_at(timeline, end_time),
+        )
+
+
+class SpotifySource(MediaSource):
+    """The user's Spotify playback, read through a shared SpotifyPlayback client."""
+
+    name = "spotify"
+
+    def __init__(self, playback):
+        self.playback = playback
+
+    async def snapshot(self) -> Optional[MediaSnapshot]:
+        playback = await self.playback.current_playback()
+        if not playback or not playback.get("item"):
+            return None
+        item = playback["item"]
+        return MediaSnapshot(
+            title=item["name"],
+            artist=", ".join(artist["name"] for artist in item.get("artists", ())),
+            status=MediaSnapshot.PLAYING if playback["is_playing"] else MediaSnapshot.PAUSED,
+            position=playback["progress_ms"] or 0,
+            end_time=item["duration_ms"],
+            source_app="Spotify.exe",
+            uri=item["uri"],
+            sampled_at=time.perf_counter() - (time.monotonic() - self.playback.fetched_at),
+        )
+
+
+class ReplaySource(MediaSource):
+    """Play back a scripted timeline of tracks, seeks and pauses from a JSON file.
+
+    The file holds a list of events ``{"at": seconds, ...}`` whose other keys (``title``, ``artist``,
+    ``duration`` and ``position`` in ms, ``playing``) update the session state at that time. A ``position`` key
+    seeks; without one the position carries on from where playback was. Setting ``title`` starts a new track at
+    position 0 unless a position is given.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, loop: bool = False):
+        with open(path, "r", encoding="utf-8") as f:
+            events = sorted(json.load(f), key=lambda event: event.get("at", 0))
+        self.events = events
+        self.times = [event.get("at", 0) for event in events]
+        self.loop = loop
+        self.started = None
+        self._states = self._compile(events)
+
+    @staticmethod
+    def _compile(events):
+        """Resolve every event into the full state it leaves behind: (fields, anchor time, anchor position)."""
+        states = []
+        fields = {"title": "", "artist": "", "duration": 0, "playing": False}
+        at, position = 0.0, 0
+        for event in events:
+            now = event.get("at", 0)
+            if fields["playing"]:
+                position += int((now - at) * 1000)
+            if "title" in event:
+                position = 0
+            fields = {**fields, **{key: event[key] for key in fields if key in event}}
+            position = event.get("position", position)
+            at = now
+            states.append((fields, at, position))
+        return states
+
+    def _position(self, elapsed):
+        index = bisect_right(self.times, elapsed) - 1
+        if index < 0:
+            return None
+        fields, at, position = self._states[index]
+        if fields["playing"]:
+            position += int((elapsed - at) * 1000)
+        return fields, min(position, fields["duration"] or position)
+
+    async def snapshot(self) -> Optional[MediaSnapshot]:
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        elapsed = now - self.started
+        if self.loop and self.times and self.times[-1] > 0:
+            elapsed %= self.times[-1]
+        state = self._position(elapsed)
+        if state is None or not state[0]["title"]:
+            return None
+        fields, position = state
+        return MediaSnapshot(
+            title=fields["title"],
+            artist=fields["artist"],
+            status=MediaSnapshot.PLAYING if fields["playing"] else MediaSnapshot.PAUSED,
+            position=position,
+            end_time=fields["duration"],
+            source_app=self.name,
+            uri="",
+            sampled_at=now,
+        )
+
+
+class MprisSource(MediaSource):
+    """An MPRIS media player on the D-Bus session bus (Linux), through the optional ``dbus_next`` package.
+
+    ``bus_name`` selects a player (e.g. ``org.mpris.MediaPlayer2.spotify``); by default the first one found is
+    used.
+    """
+
+    name = "mpris"
+    PATH = "/org/mpris/MediaPlayer2"
+    PREFIX = "org.mpris.MediaPlayer2."
+    STATUS = {"Playing": MediaSnapshot.PLAYING, "Paused": MediaSnapshot.PAUSED, "Stopped": MediaSnapshot.STOPPED}
+
+    def __init__(self, bus_name: Optional[str] = None):
+        self.bus_name = bus_name
+        self.bus = None
+        self.player = None
+
+    async def _connect(self):
+        from dbus_next.aio import MessageBus
+        self.bus = await MessageBus().connect()
+        bus_name = self.bus_name
+        if not bus_name:
+            introspection = await self.bus.introspect("org.freedesktop.DBus", "/org/freedesktop/DBus")
+            dbus = self.bus.get_proxy_object("org.freedesktop.DBus", "/org/freedesktop/DBus", introspection)
+            names = await dbus.get_interface("org.freedesktop.DBus").call_list_names()
+            bus_name = next((name for name in sorted(names) if name.startswith(self.PREFIX)), None)
+            if bus_name is None:
+                return
+        introspection = await self.bus.introspect(bus_name, self.PATH)
+        self.player = self.bus.get_proxy_object(bus_name, self.PATH, introspection).get_interface(
+            self.PREFIX + "Player")
+
+    async def snapshot(self) -> Optional[MediaSnapshot]:
+        if self.player is None:
+            if self.bus is not None:
+                self.close()
+            await self._connect()
+            if self.player is None:
+                return None
+        try:
+            metadata = await self.player.get_metadata()
+            status = await self.player.get_playback_status()
+            position = await self.player.get_position()
+            sampled_at = time.perf_counter()
+        except Exception:
+            self.close()
+            raise
+        artist = metadata["xesam:artist"].value if "xesam:artist" in metadata else ()
+        return MediaSnapshot(
+            title=metadata["xesam:title"].value if "xesam:title" in metadata else "",
+            artist=", ".join(artist) if isinstance(artist, list) else str(artist),
+            status=self.STATUS.get(status, MediaSnapshot.STOPPED),
+            position=position // 1000,
+            end_time=metadata["mpris:length"].value // 1000 if "mpris:length" in metadata else 0,
+            source_app=self.player.bus_name,
+            uri="",
+            sampled_at=sampled_at,
+        )
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.disconnect()
+        self.bus = None
+        self.player = None
@@ -2,7 +2,9 @@ import asyncio
 import json
 import logging
 import os
+import time
 from functools import partial
+from typing import NamedTuple
 from PyQt6.QtCore import QThread, pyqtSignal, QObject
 from PyQt6.QtGui import (QTextCursor, QTextOption)
 from PyQt6.QtWidgets import (QHBoxLayout,
@@ -10,8 +12,11 @@ from PyQt6.QtWidgets import (QHBoxLayout,
                              QLineEdit, QGroupBox, QSpacerItem,
                              QSizePolicy, QTextEdit, QScrollArea)
 
-from main import Logger
 from utils.animator import NekoAnimator
+from utils.log import Logger
+from utils.osc import OSCListener, ParameterStream, RateLimitedSender
+from utils.pipeline import Formatter, RenderedFrame
+from utils.scheduler import TickScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -373,20 +378,28 @@ class ConfigTabs(QTabWidget):
         """Handle changes in QCheckBox."""
 
         def inner(state):
+            self.config_manager.set_value(key, bool(state))
             if key == "pulsoid.Enabled" and bool(state):
-                asyncio.run(self.nekoosc.setup_pulsoid())
+                self.nekoosc.worker.submit(self.nekoosc.setup_pulsoid())
             elif key == "spotify.Enabled" and bool(state):
-                asyncio.run(self.nekoosc.setup_spotify())
-            self.config_manager.set_value(key, bool(state))
+                self.nekoosc.setup_spotify()
 
         return inner
 
 
 class WorkerSignals(QObject):
-    data_updated = pyqtSignal(dict)
+    status_updated = pyqtSignal(object)
     osc_sent = pyqtSignal()
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    config_value = pyqtSignal(str, object)
+
+
+class UiStatus(NamedTuple):
+    """Everything the window shows about the worker, sent to the GUI thread in one signal."""
+    preview: str
+    connection: str
+    last_update: str
 
 
 class Worker(QThread):
@@ -395,11 +408,24 @@ class Worker(QThread):
         self.neko_osc = neko_osc_instance
         self.running = False
         self.signals = WorkerSignals()
-        self.loop = None
+        self.loop = asyncio.new_event_loop()
         self._stop_event = asyncio.Event()
+        self.frame = RenderedFrame("", "", False)
+        self.status = UiStatus("", "Disconnected", "Last Update Time: 0")
+        self.ui_fps = 10
+        self._status_emitted_at = 0.0
+        self._status_pending = None
+        self.scheduler = TickScheduler()
+        self.sender = RateLimitedSender(self.send_message, skip=self._is_duplicate)
+        self.parameters = ParameterStream(self.neko_osc.osc.client)
+        self.listener = OSCListener(on_packet=self.wake)
+        self._low_power = False
+        self._wake = None
+        self.heart_rate_delta = 3
+        self._shown_heart_rate = 0
+        self._shown_heart_rate_bands = ()
 
     def run(self):
-        self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
         try:
@@ -412,14 +438,18 @@ class Worker(QThread):
             self.signals.finished.emit()
 
     async def main_loop(self):
+        self._wake = asyncio.Event()
+        self.sender.start()
         while True:
-            if self.running and not self._stop_event.is_set():
+            await self._sync_listener()
+            self._sync_streams()
+            if self.active and not self._stop_event.is_set():
                 try:
-                    await asyncio.gather(
-                        self.refresh_data(),
-                        self.send_message(),
-                        asyncio.sleep(1.5)
-                    )
+                    started = time.perf_counter()
+                    await self.tick()
+                    delay = self.scheduler.next_delay(self._deadlines(), self.neko_osc.is_playing,
+                                                      time.perf_counter() - started)
+                    await self._sleep(delay, started + self.scheduler.min_interval)
                 except asyncio.CancelledError:
                     break
                 except Exception as e:
@@ -432,48 +462,162 @@ class Worker(QThread):
 
             if self._stop_event.is_set():
                 break
+        for service in (self.sender, self.parameters, self.neko_osc.pulsoid_connector, self.neko_osc.spotify_tokens):
+            if service is not None:
+                service.stop()
+        self.listener.close()
+        await self.neko_osc.close_sessions()
+
+    def _deadlines(self):
+        """The upcoming output changes; none (so the keepalive applies) if they cannot be worked out."""
+        try:
+            return self.neko_osc.next_deadlines()
+        except Exception as e:
+            logger.exception(f"Deadline error: {str(e)}")
+            return ()
+
+    @property
+    def active(self):
+        """Whether the worker is started and VRChat is still sending OSC traffic."""
+        return self.running and self.listener.alive()
+
+    async def _sync_listener(self):
+        """Bind the OSC listener and log when the worker drops into or leaves the low-power state."""
+        await self.listener.sync()
+        if self.listener.error is not None:
+            Logger.warning(f"OSC listener disabled: {self.listener.error}")
+            self.listener.error = None
+        low_power = self.running and not self.listener.alive()
+        if low_power != self._low_power:
+            self._low_power = low_power
+            if low_power:
+                Logger.info(f"No OSC traffic for {self.listener.timeout:.0f}s, pausing updates")
+            else:
+                Logger.info("OSC traffic resumed, resuming updates")
+
+    def _sync_streams(self):
+        """Keep the Pulsoid WebSocket, the avatar parameter stream and the Spotify token refresh running on this
+        loop while enabled."""
+        services = ((self.neko_osc.pulsoid_connector, self.neko_osc.pulsoid_enabled),
+                    (self.parameters, self.neko_osc.avatar_enabled),
+                    (self.neko_osc.spotify_tokens, self.neko_osc.spotify_enabled))
+        for service, enabled in services:
+            if service is None:
+                continue
+            if self.active and enabled:
+                service.start()
+            elif service.running:
+                service.stop()
+
+    async def _sleep(self, delay, not_before):
+        """Sleep until the next deadline, or until wake() asks for an early tick, but not before ``not_before``."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+        remaining = not_before - time.perf_counter()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    def on_heart_rate(self, heart_rate):
+        """Pulsoid listener: tick early when the heart rate moved by heart_rate_delta or into another frame."""
+        if not self.neko_osc.pulsoid_enabled:
+            return
+        if (abs(heart_rate - self._shown_heart_rate) >= self.heart_rate_delta
+                or self.neko_osc.heart_rate_bands(heart_rate) != self._shown_heart_rate_bands):
+            self.wake()
+
+    def submit(self, coro):
+        """Run a coroutine on the worker loop from any thread and return its concurrent Future."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            Logger.error(f"Background task error: {future.exception()}")
+
+    def wake(self):
+        """Request an early tick; safe to call from any thread."""
+        if self.loop is not None and self._wake is not None:
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    async def tick(self):
+        """Refresh media data, render a single frame and hand it to the sender and the visualizer."""
+        await self.refresh_data()
+        if not self.running:
+            return  # stopped while refreshing, the chatbox and preview are being cleared
+        self.frame = Formatter.render(self.neko_osc)
+        if self.neko_osc.pulsoid_enabled:
+            self._shown_heart_rate = self.neko_osc.pulsoid_connector.get_latest_heart_rate(max_time=5)
+            self._shown_heart_rate_bands = self.neko_osc.heart_rate_bands(self._shown_heart_rate)
+        self.sender.submit(self.frame)
+        if self.frame.is_playing:
+            self._publish_status(preview=self.frame.preview,
+                                 last_update=f"Last Update Time: {time.strftime('%H:%M:%S')}")
+        else:
+            self._publish_status(preview=self.frame.preview)
 
     async def refresh_data(self):
         """Refresh media data."""
         try:
-            song_info, playback_info, timeline_info = await self.neko_osc._get_media_info()
-            if all([song_info, playback_info, timeline_info]):
-                if self.neko_osc.spotify_enabled and self.neko_osc.app_lock:
-                    await self.neko_osc._update_song_info_spotify(song_info)
-                else:
-                    await self.neko_osc._update_song_info(song_info, playback_info,
-                                                          timeline_info)
-                self.signals.data_updated.emit(self.neko_osc.data)
+            snapshot = await self.neko_osc._get_media_info()
+            if snapshot is not None:
+                await self.neko_osc._update_song_info(snapshot)
         except Exception as e:
             logger.exception(f"Refresh error: {str(e)}")
             self.signals.error.emit(f"Refresh error: {str(e)}")
 
-    async def send_message(self):
-        """Send OSC message."""
-        if self.neko_osc.is_playing:
-            formatted_message = Formatter.format(
-                self.neko_osc)
-            Logger.info(f"Sending OSC message: \n\n{formatted_message}\n\n")
-            if self.neko_osc.osc.send_message(formatted_message):
-                self.neko_osc.connection_status.setText("Connected")
-            else:
-                self.neko_osc.connection_status.setText("Disconnected")
+    def _is_duplicate(self, frame):
+        """Checked by the sender before it spends a token on the frame."""
+        return self.neko_osc.osc.is_duplicate(frame.payload)
+
+    async def send_message(self, frame):
+        """Send the rendered frame over OSC; called by the rate limited sender."""
+        if frame.is_playing:
             self.neko_osc.osc_lock = False
-            self.signals.osc_sent.emit()
-        elif not self.neko_osc.is_playing:
-            if self.neko_osc.idle:
-                Logger.info("Sending idle message")
-                text = Formatter.format(self.neko_osc, self.neko_osc.idle)
-                self.neko_osc.osc.send_message(text)
-                self.neko_osc.data_display.setText(text if not self.neko_osc.invisible else text[:-2])
+        elif not frame.payload:
+            self.neko_osc.osc_lock = True
+        if await self.neko_osc.osc.send_message(frame.payload):
+            if frame.is_playing:
+                Logger.info(f"Sent OSC message: \n\n{frame.payload}\n\n")
+            elif frame.payload:
+                Logger.info("Sent idle message")
             else:
-                Logger.info("Sending empty OSC message")
-                if self.neko_osc.osc.send_message(""):
-                    self.neko_osc.connection_status.setText("Connected")
-                else:
-                    self.neko_osc.connection_status.setText("Disconnected")
-                self.neko_osc.osc_lock = True
-            self.signals.osc_sent.emit()
+                Logger.info("Sent empty OSC message")
+        self._publish_status(connection=self.neko_osc.osc.status())
+        self.signals.osc_sent.emit()
+
+    def _publish_status(self, **changes):
+        """Update the UI status and emit it, at most ui_fps times per second and only when it changed."""
+        status = self.status._replace(**changes)
+        if status == self.status:
+            return
+        self.status = status
+        if self._status_pending is not None:
+            return
+        delay = self._status_emitted_at + 1 / self.ui_fps - time.perf_counter() if self.ui_fps > 0 else 0
+        if delay > 0:
+            self._status_pending = self.loop.call_later(delay, self._emit_status)
+        else:
+            self._emit_status()
+
+    def _emit_status(self):
+        self._status_pending = None
+        self._status_emitted_at = time.perf_counter()
+        self.signals.status_updated.emit(self.status)
+
+    def clear_chatbox(self):
+        """Queue an empty chatbox message and blank the preview; safe to call from any thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._clear_chatbox)
+
+    def _clear_chatbox(self):
+        self.frame = RenderedFrame("", "", False)
+        self.sender.submit(self.frame)
+        self._publish_status(preview="")
 
     def start_processing(self):
         self.running = True
@@ -482,68 +626,8 @@ class Worker(QThread):
         self.running = False
 
     def stop(self):
-        self._stop_event.set()
+        """Stop the main loop, waking it from its sleep, and wait for the thread to finish."""
+        if self.isRunning():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+            self.wake()
         self.wait()
-
-
-class Formatter:
-    @staticmethod
-    def format(nekoosc, text=""):
-        """Format the data dictionary using the provided template."""
-        try:
-            def get_animation(animation, percentage=0):
-                if nekoosc.is_playing and not percentage:
-                    percentage = nekoosc.duration / nekoosc.totalduration
-                    percentage = percentage * 100000
-                return nekoosc.animations[animation.name].next_frame(percentage=percentage).text
-
-            def adjust_with_pulsoid():
-                pulsoid_text = nekoosc.pulsoid_text.replace("$hr", hr or "")
-                for key, value in nekoosc.animations.items():
-                    pulsoid_text = pulsoid_text.replace(f"*{key}", get_animation(value, int(hr) or 1))
-
-                pulsoid_text_length = len(pulsoid_text)
-                if template:
-                    if len(template) + pulsoid_text_length + 1 > 144:
-                        return template[:144 - pulsoid_text_length] + "\n" + pulsoid_text
-                    return template + "\n" + pulsoid_text
-                else:
-                    return pulsoid_text
-
-            template = nekoosc.format if not text else text
-            hr = 0
-            if nekoosc.pulsoid_enabled:
-                hr = str(nekoosc.pulsoid_connector.get_latest_heart_rate(max_time=5))
-                if not hr:
-                    hr = 0
-
-            for key, value in nekoosc.data.items():
-                if value:
-                    template = template.replace(f"${key}", str(value))
-                elif key != "lyrics" and not value and not text or not nekoosc.is_playing and not text:
-                    template = ""
-                    template = template.replace(f"${key}", "")
-                    if nekoosc.pulsoid_enabled and int(hr) != 0:
-                        return adjust_with_pulsoid()
-                    elif nekoosc.pulsoid_enabled and int(hr) == 0 and nekoosc.invisible:
-                        return adjust_with_pulsoid() + "\u0003\u001f"
-                    return ""
-                elif key and not value:
-                    template = template.replace(f"${key}", "")
-
-            for key, value in nekoosc.animations.items():
-                template = template.replace(f"*{key}", get_animation(value))
-
-            if nekoosc.pulsoid_enabled and int(hr) != 0:
-                if nekoosc.invisible:
-                    return adjust_with_pulsoid() + "\u0003\u001f"
-                else:
-                    return adjust_with_pulsoid()
-            elif nekoosc.invisible and not nekoosc.pulsoid_enabled or int(hr) == 0 and nekoosc.invisible:
-                return (template[:142] if len(template) >= 144 else template) + "\u0003\u001f"
-
-            return template
-
-        except Exception as e:
-            Logger.error(f"Error in Formatter: {e}")
-            return ""
\ No newline at end of file
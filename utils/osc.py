@@ -0,0 +1,385 @@
+import asyncio
+import inspect
+import ipaddress
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+from utils.log import Logger
+from utils.tasks import BackgroundService
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` sends per second with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float = 1.0, capacity: float = 3.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.perf_counter()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Take a token and return 0, or return how many seconds to wait until one is available."""
+        now = time.perf_counter() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class RateLimitedSender(BackgroundService):
+    """Output stage that hands frames to ``send`` no faster than its token bucket allows.
+
+    Only the newest submitted frame is kept: a frame that is replaced before it could be sent is dropped and
+    counted in ``coalesced``, so the sender never builds a backlog and never falls behind real time. A frame for
+    which ``skip`` returns True is dropped without spending a token and counted in ``skipped``.
+    """
+
+    def __init__(self, send: Callable[[Any], Any], rate: float = 1.0, burst: float = 3.0,
+                 skip: Optional[Callable[[Any], bool]] = None):
+        self.send = send
+        self.skip = skip
+        self.bucket = TokenBucket(rate, burst)
+        self.delivered = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self._pending = None
+        self._has_pending = False
+        self._ready = None
+
+    def submit(self, frame):
+        """Queue a frame for sending, replacing any frame that has not been sent yet."""
+        if self._has_pending:
+            self.coalesced += 1
+        self._pending = frame
+        self._has_pending = True
+        if self._ready is not None:
+            self._ready.set()
+
+    async def run(self):
+        self._ready = asyncio.Event()
+        if self._has_pending:
+            self._ready.set()
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._has_pending:
+                if self.skip is not None and self.skip(self._pending):
+                    self._pending, self._has_pending = None, False
+                    self.skipped += 1
+                    break
+                wait = self.bucket.take()
+                if wait:
+                    await asyncio.sleep(wait)
+                    continue
+                frame, self._pending, self._has_pending = self._pending, None, False
+                result = self.send(frame)
+                if inspect.isawaitable(result):
+                    await result
+                self.delivered += 1
+
+
+def parse_targets(text: str) -> List[Tuple[str, int]]:
+    """Parse a comma separated ``host:port`` list (``[::1]:9000`` for IPv6), skipping malformed entries."""
+    targets = []
+    for entry in text.split(","):
+        host, _, port = entry.strip().rpartition(":")
+        if host.startswith("[") and host.endswith("]"):
+            host = host[1:-1]
+        if host and port.isdigit() and 0 < int(port) < 65536:
+            targets.append((host, int(port)))
+        elif entry.strip():
+            Logger.warning(f"Ignoring malformed OSC target: {entry.strip()!r}")
+    return targets
+
+
+def is_loopback(host: str) -> bool:
+    """Return True if host names this machine (``localhost`` or a loopback address)."""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class OSCTarget(asyncio.DatagramProtocol):
+    """One destination of an OSCClient, counting the datagrams sent to it and the errors reported back."""
+
+    FAILING_WINDOW = 10.0
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.transport = None
+        self.sent = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_error_at = 0.0
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def error_received(self, exc):
+        self.errors += 1
+        self.last_error = exc
+        self.last_error_at = time.time()
+
+    def send(self, dgram: bytes):
+        if self.transport is None:
+            self.error_received(ConnectionError("Not connected"))
+            return
+        self.transport.sendto(dgram)
+        self.sent += 1
+
+    @property
+    def failing(self) -> bool:
+        """Whether the target is closed or reported an error within the last FAILING_WINDOW seconds."""
+        return self.transport is None or time.time() - self.last_error_at < self.FAILING_WINDOW
+
+
+class OSCClient:
+    """Asyncio OSC sender holding one non-blocking datagram endpoint per ``(host, port)`` target.
+
+    Each message is encoded once and the same bytes are sent to every target. Changing the targets only
+    replaces the endpoints on the next send, on the event loop that sends; senders keep using the old endpoints
+    until the new ones are open.
+    """
+
+    def __init__(self, targets: Iterable[Tuple[str, int]] = (("127.0.0.1", 9000),)):
+        self.targets: List[OSCTarget] = []
+        self._wanted = list(targets)
+        self._opened = None
+        self._lock = asyncio.Lock()
+
+    def set_targets(self, targets: Iterable[Tuple[str, int]]) -> bool:
+        """Replace the target list and return whether it changed; safe to call from any thread."""
+        wanted = list(targets)
+        changed = wanted != self._wanted
+        self._wanted = wanted
+        return changed
+
+    async def _open(self):
+        """Open endpoints for the wanted targets, then swap them in for the old ones."""
+        async with self._lock:
+            wanted = self._wanted
+            if self._opened == wanted:
+                return
+            loop = asyncio.get_running_loop()
+            targets = []
+            for host, port in wanted:
+                target = OSCTarget(host, port)
+                try:
+                    await loop.create_datagram_endpoint(lambda: target, remote_addr=(host, port))
+                except (OSError, OverflowError, ValueError) as e:
+                    target.error_received(e)
+                targets.append(target)
+            self.close()
+            self.targets = targets
+            self._opened = wanted
+
+    @staticmethod
+    def encode(address: str, args) -> bytes:
+        builder = OscMessageBuilder(address=address)
+        for arg in args:
+            builder.add_arg(arg)
+        return builder.build().dgram
+
+    async def send_message(self, address: str, args) -> bool:
+        """Send one message to every target and return True if none of them is failing."""
+        if self._opened != self._wanted:
+            await self._open()
+        dgram = self.encode(address, args)
+        for target in self.targets:
+            target.send(dgram)
+        return not any(target.failing for target in self.targets)
+
+    def status(self) -> str:
+        """Short status line: the failing targets with their error counts, or how many targets are fed."""
+        failing = [f"{target} ({target.errors})" for target in self.targets if target.failing]
+        if failing:
+            return "Errors: " + ", ".join(failing)
+        if not self.targets:
+            return "Disconnected"
+        return f"Sending to {len(self.targets)} target{'s' if len(self.targets) > 1 else ''}"
+
+    def close(self):
+        for target in self.targets:
+            if target.transport is not None:
+                target.transport.close()
+        self.targets = []
+        self._opened = None
+
+
+class AvatarParameter:
+    """An ``/avatar/parameters/<name>`` value read from ``read()`` and quantized to multiples of ``quantum``."""
+
+    def __init__(self, name: str, read: Callable[[], Any], quantum: float = 0):
+        self.name = name
+        self.address = f"/avatar/parameters/{name}"
+        self.read = read
+        self.quantum = quantum
+        self.value = None
+        self.sent_at = 0.0
+
+    def sample(self):
+        value = self.read()
+        if self.quantum and isinstance(value, float):
+            value = round(value / self.quantum) * self.quantum
+        return value
+
+
+class ParameterStream(BackgroundService):
+    """Publish avatar parameters at ``rate`` Hz, independently of the chatbox.
+
+    A parameter is only sent when its quantized value changed, or every ``keepalive`` seconds so it survives
+    avatar changes.
+    """
+
+    def __init__(self, client: OSCClient, rate: float = 10.0, keepalive: float = 5.0):
+        self.client = client
+        self.rate = rate
+        self.keepalive = keepalive
+        self.parameters: List[AvatarParameter] = []
+        self.sent = 0
+        self.suppressed = 0
+
+    def set_parameters(self, parameters: Iterable[AvatarParameter]):
+        self.parameters = [parameter for parameter in parameters if parameter.name]
+
+    async def publish(self, now: Optional[float] = None):
+        """Send every parameter that changed or is due for a keepalive."""
+        now = time.perf_counter() if now is None else now
+        for parameter in self.parameters:
+            value = parameter.sample()
+            if value == parameter.value and now - parameter.sent_at < self.keepalive:
+                self.suppressed += 1
+                continue
+            await self.client.send_message(parameter.address, [value])
+            parameter.value = value
+            parameter.sent_at = now
+            self.sent += 1
+
+    async def run(self):
+        while True:
+            await self.publish()
+            await asyncio.sleep(1 / self.rate if self.rate > 0 else 1.0)
+
+    def stop(self):
+        super().stop()
+        for parameter in self.parameters:
+            parameter.value = None
+
+
+class OSCListener(asyncio.DatagramProtocol):
+    """Watch the OSC traffic VRChat sends out to tell whether anyone is there to read the chatbox.
+
+    The listener is considered alive until ``timeout`` seconds pass without an inbound packet; it is always alive
+    when the timeout is 0 or the port is 0 or could not be bound, which is the default. ``on_packet`` is called on
+    the first packet after a silence.
+    """
+
+    def __init__(self, port: int = 0, timeout: float = 0.0, host: str = "127.0.0.1",
+                 on_packet: Optional[Callable[[], Any]] = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.on_packet = on_packet
+        self.transport = None
+        self.packets = 0
+        self.last_packet = time.monotonic()
+        self.error = None
+        self._bound = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        was_alive = self.alive()
+        self.last_packet = time.monotonic()
+        self.packets += 1
+        if not was_alive and self.on_packet is not None:
+            self.on_packet()
+
+    def alive(self, now: Optional[float] = None) -> bool:
+        if not self.timeout or self.transport is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self.last_packet < self.timeout
+
+    async def sync(self):
+        """(Re)bind the listening socket if the port changed; call on the event loop that should receive."""
+        if self._bound == (self.host, self.port):
+            return
+        self.close()
+        self._bound = (self.host, self.port)
+        self.last_packet = time.monotonic()
+        if not self.port:
+            return
+        try:
+            await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=self._bound)
+            self.error = None
+        except OSError as e:
+            self.error = e
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        self._bound = None
+
+
+class VRCClient:
+    def __init__(self, targets=(("127.0.0.1", 9000),), resend_interval=10.0):
+        """Initialize the client with the provided (host, port) targets.
+
+        A payload identical to the last one sent is suppressed until resend_interval seconds have passed.
+        """
+        self.client = OSCClient(targets)
+        self.resend_interval = resend_interval
+        self.last_message = None
+        self.last_sent = 0.0
+        self.sent = 0
+        self.suppressed = 0
+
+    def set_targets(self, targets):
+        """Point the client at new targets; only a real change resends the current message to them."""
+        if self.client.set_targets(targets):
+            self.last_message = None
+
+    def status(self):
+        return self.client.status()
+
+    def is_duplicate(self, message):
+        """Return True, counting it as suppressed, if message repeats the last one sent within resend_interval."""
+        if message == self.last_message and time.perf_counter() - self.last_sent < self.resend_interval:
+            self.suppressed += 1
+            return True
+        return False
+
+    async def send_message(self, message, force=False):
+        """Send a chat message to VRChat and return True if it was sent, False if suppressed or failed.
+
+        Whether every target accepted it is reported by status().
+        """
+        if not force and self.is_duplicate(message):
+            return False
+        try:
+            await self.client.send_message('/chatbox/input', [message, True])
+        except Exception as e:
+            Logger.error(f"Error sending message: {e}")
+            return False
+        self.last_message = message
+        self.last_sent = time.perf_counter()
+        self.sent += 1
+        Logger.debug(f"OSC messages: {self.sent} sent, {self.suppressed} suppressed")
+        return True
@@ -0,0 +1,390 @@
+import asyncio
+import time
+import traceback
+from typing import NamedTuple
+
+from utils.clock import PlaybackClock
+from utils.log import Logger
+from utils.lyrics.musixmatch import Song
+from utils.lyrics.resolver import LyricsResolver
+from utils.lyrics.romaji import romanize_sheet_async
+from utils.lyrics.sheet import LyricSheet
+from utils.osc import VRCClient
+from utils.template import Template
+
+
+class TimeUtils:
+    @staticmethod
+    def time_to_ms(time_str):
+        """Convert a time string formatted as minutes:seconds to milliseconds."""
+        minutes, seconds = map(int, time_str.split(":"))
+        total_seconds = minutes * 60 + seconds
+        milliseconds = total_seconds * 1000
+        return milliseconds
+
+    @staticmethod
+    def seconds_to_m_s(seconds):
+        """Convert seconds to a string formatted as minutes:seconds."""
+        minutes = int(seconds // 60)
+        seconds_remaining = int(seconds % 60)
+        return f"{minutes}:{seconds_remaining:02}"
+
+
+class RenderedFrame(NamedTuple):
+    """One tick worth of output, shared by the OSC sender and the visualizer."""
+    payload: str
+    preview: str
+    is_playing: bool
+
+
+class ChatboxPipeline:
+    """The media -> lyrics -> chatbox text path, free of Qt so it also runs headless.
+
+    A media source snapshot updates the playback clock and the current lyric line (``_update_song_info``),
+    ``Formatter.render`` turns that state into the chatbox text and ``osc`` sends it. NekoOSC mixes this in and
+    fills in the settings from its config; on its own the defaults are a blank Format and the 127.0.0.1:9000
+    OSC target.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.format = ""
+        self.placeholder = ""
+        self.idle = ""
+        self.invisible = False
+        self.romaji = False
+        self.offset = 0
+
+        self.pulsoid_connector = None
+        self.pulsoid_enabled = False
+        self.pulsoid_text = ""
+
+        self.osc = VRCClient()
+        self.media_source = None
+        self.lyrics_resolver = LyricsResolver()
+        self.animations = {}
+        self.templates = {}
+
+        self.songname = ""
+        self.lyrics = ""
+        self.lyricnumber = -1
+        self.totallyrics = 0
+        self.data = {
+            "title": "",
+            "artist": "",
+            "duration": "",
+            "totalduration": "",
+            "lyrics": "",
+        }
+        self.started = False
+        self.is_playing = False
+        self.starttime = 0
+        self.clock = PlaybackClock()
+        self.totalduration = 0
+        self.song = None
+        self.romaji_task = None
+        self.pt = ""
+
+    def playback_progress(self):
+        """Return the playback position as a fraction of the song duration."""
+        if not self.totalduration:
+            return 0.0
+        return max(0.0, min(1.0, self.clock.position() / self.totalduration))
+
+    async def _get_media_info(self):
+        """Read the current media session from the configured media source."""
+        if self.media_source is None:
+            return None
+        try:
+            return await self.media_source.snapshot()
+        except Exception as e:
+            Logger.error(f"Media info error: {str(e)}")
+            return None
+
+    def _song(self, snapshot, uri=""):
+        """Return the Song for a snapshot, reusing the previous one while the track is unchanged."""
+        song = self.song
+        if song is None or (song.title, song.artist, song.duration, song.uri) != (
+                snapshot.title, snapshot.artist, snapshot.duration, uri):
+            song = self.song = Song({"title": snapshot.title, "artist": snapshot.artist,
+                                     "duration": snapshot.duration}, uri)
+        return song
+
+    async def _update_song_info(self, snapshot):
+        """Update song and playback information, including lyrics and sync."""
+        try:
+            self.is_playing = snapshot.is_playing
+            await self._update_playback(self._song(snapshot, snapshot.uri), snapshot.position, snapshot.sampled_at)
+        except Exception as e:
+            Logger.error(f"Update song info error: {str(e)}")
+
+    async def _update_playback(self, song, position, sampled_at=None):
+        """Feed a position sample, taken at ``sampled_at``, to the playback clock, loading lyrics when the song
+        changes."""
+        if self.songname != song.title:
+            self.clock.reset(position, self.is_playing, sampled_at)
+            self.totalduration = TimeUtils.time_to_ms(song.duration)
+            self.songname = song.title
+            await self._load_lyrics(song)
+        else:
+            event = self.clock.update(position, self.is_playing, sampled_at)
+            if event:
+                Logger.debug(f"Playback {event} at {position} ms")
+
+        if not self.is_playing:
+            self._reset_media_state()
+            self._process_stopped_state()
+        else:
+            self._process_playing_state(song)
+
+    async def _load_lyrics(self, song):
+        """Fetch the lyric sheet for a new song and start its romaji conversion in the background."""
+        if self.romaji_task is not None:
+            self.romaji_task.cancel()
+            self.romaji_task = None
+        self.lyrics, provider = await self._find_lyrics(song)
+        Logger.info(f"Fetched lyrics: {self.lyrics}")
+        self.lyricnumber = -1
+        self.totallyrics = len(self.lyrics) if isinstance(self.lyrics, LyricSheet) else 0
+        if (self.romaji and isinstance(self.lyrics, LyricSheet) and self.lyrics.romaji is None
+                and any(flags & LyricSheet.JAPANESE for flags in self.lyrics.flags)):
+            self.romaji_task = asyncio.get_running_loop().create_task(
+                self._romanize_lyrics(song, self.lyrics, provider))
+
+    async def _romanize_lyrics(self, song, sheet, provider):
+        """Convert a whole lyric sheet to romaji off the tick path and keep the result in the lyrics cache."""
+        try:
+            romaji = await romanize_sheet_async(sheet)
+            if self.songname != song.title or self.lyrics is not sheet:
+                return
+            sheet.romaji = romaji
+            self.lyrics_resolver.store(provider, song, sheet)
+            Logger.info(f"Converted lyrics to Romaji: {song.title}")
+        except Exception as e:
+            Logger.error(f"Romaji conversion error: {str(e)}")
+
+    async def _find_lyrics(self, song):
+        """Race the enabled lyrics providers, all of them behind the lyrics cache."""
+        lyrics, provider = await self.lyrics_resolver.resolve(song)
+        if provider:
+            Logger.info(f"Lyrics provided by {provider} in {self.lyrics_resolver.last_latency:.3f}s "
+                        f"(wins: {dict(self.lyrics_resolver.wins)})")
+        else:
+            Logger.error(f"Lyrics error: {lyrics['error']}")
+        cache = self.lyrics_resolver.cache
+        if cache is not None:
+            Logger.debug(f"Lyrics cache: {cache.hits} hits, {cache.misses} misses")
+        return lyrics, provider
+
+    def next_deadlines(self):
+        """Return the seconds until each upcoming lyric line or animation frame change."""
+        deadlines = []
+        templates = [self.templates.get("format" if self.is_playing else "idle")]
+        if self.pulsoid_enabled:
+            templates.append(self.templates.get("pulsoid"))
+        now = time.perf_counter()
+        position_ms = self.clock.position(now)
+
+        if self.is_playing and isinstance(self.lyrics, LyricSheet):
+            next_start = self.lyrics.next_start(position_ms - self.offset)
+            if next_start is not None:
+                deadlines.append(self.clock.time_until(next_start + self.offset, now))
+
+        for template in templates:
+            if template is None:
+                continue
+            for name in template.animations:
+                animation = self.animations[name]
+                if animation.type == "duration":
+                    deadlines.append(animation.seconds_until_next_frame())
+                elif self.is_playing and template is templates[0] and self.totalduration:
+                    percentage = position_ms / self.totalduration * 100
+                    next_percentage = animation.next_percentage(percentage)
+                    if next_percentage is not None:
+                        deadlines.append(self.clock.time_until(next_percentage * self.totalduration / 100, now))
+        return deadlines
+
+    def heart_rate_bands(self, heart_rate):
+        """Return the frame each percentage animation in the pulsoid Text shows for ``heart_rate``."""
+        template = self.templates.get("pulsoid")
+        if template is None:
+            return ()
+        return tuple(self.animations[name].frame_index(heart_rate or 1) for name in template.animations
+                     if self.animations[name].type == "percentage")
+
+    def _reset_media_state(self):
+        """Reset the state when media is paused or stopped."""
+        self.started = False
+        Logger.debug("Media state reset.")
+
+    def _process_stopped_state(self):
+        if self.pulsoid_enabled:
+            heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
+            if heartrate:
+                Logger.debug(f"Got heartrate | {heartrate}")
+                self.pt = self.pulsoid_text.replace("$hr", str(heartrate))
+            else:
+                self.pt = ""
+
+    def _process_playing_state(self, song):
+        """Process the playing state to update song and lyrics info."""
+        self.starttime = time.perf_counter()
+        if isinstance(self.lyrics, LyricSheet):
+            self._show_lyrics(song)
+            return
+
+        elapsed_time = time.perf_counter() - self.starttime
+        Logger.debug(f"{self.clock.position()} || {self.clock.seconds()}")
+        self.data = {
+            "title": song.title,
+            "artist": song.artist,
+            "duration": TimeUtils.seconds_to_m_s(self.clock.seconds()),
+            "totalduration": song.duration,
+            "lyrics": self.placeholder,
+        }
+        if self.pulsoid_enabled:
+            heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
+            if heartrate:
+                Logger.debug(f"Got heartrate | {heartrate}")
+                self.data["hr"] = heartrate
+        Logger.debug(f"_process_playing_state completed in {elapsed_time:.4f} seconds")
+
+    def _show_lyrics(self, song):
+        """Show the lyric line playing at the current clock position, looked up in the lyric timeline."""
+        try:
+            position_ms = self.clock.position()
+            index = self.lyrics.index_at(position_ms - self.offset)
+            Logger.debug(f"{index} || {position_ms}")
+            self.started = index >= 0
+            self.lyricnumber = index
+            flags = self.lyrics.flags[index] if index >= 0 else LyricSheet.EMPTY
+
+            self.data["title"] = song.title
+            self.data["artist"] = song.artist
+            self.data["duration"] = TimeUtils.seconds_to_m_s(position_ms / 1000)
+            self.data["totalduration"] = song.duration
+            if flags & LyricSheet.EMPTY:
+                self.data["lyrics"] = self.placeholder
+            elif flags & LyricSheet.JAPANESE and self.romaji and self.lyrics.romaji is not None:
+                self.data["lyrics"] = self.lyrics.romaji[index]
+            else:
+                self.data["lyrics"] = self.lyrics.texts[index]
+            end_time = time.perf_counter()
+            elapsed_time = end_time - self.starttime
+
+            if self.pulsoid_enabled:
+                heartrate = self.pulsoid_connector.get_latest_heart_rate(max_time=5)
+                if heartrate:
+                    Logger.debug(f"Got heartrate | {heartrate}")
+                    self.data["hr"] = heartrate
+            Logger.debug(f"_show_lyrics completed in {elapsed_time:.4f} seconds")
+        except Exception as e:
+            tb = traceback.format_exc()
+            Logger.error(f"Error in _show_lyrics: {e}\n{tb}")
+
+
+class Formatter:
+    HEART_RATE_STATS = ("hr_avg", "hr_max", "hr_min", "hr_trend", "hr_zone")
+    PLACEHOLDERS = ("title", "artist", "duration", "totalduration", "lyrics", "hr") + HEART_RATE_STATS
+
+    @staticmethod
+    def compile(nekoosc):
+        """Compile the Format, Idle and pulsoid Text templates against the loaded animations."""
+        animations = list(nekoosc.animations)
+        nekoosc.templates = {
+            "format": Template(nekoosc.format, Formatter.PLACEHOLDERS, animations),
+            "idle": Template(nekoosc.idle, Formatter.PLACEHOLDERS, animations),
+            "pulsoid": Template(nekoosc.pulsoid_text, Formatter.PLACEHOLDERS, animations),
+        }
+
+    @staticmethod
+    def render(nekoosc):
+        """Render the chatbox payload and its wrapped preview for the current tick."""
+        if nekoosc.is_playing:
+            payload = Formatter.format(nekoosc)
+        elif nekoosc.idle:
+            payload = Formatter.format(nekoosc, idle=True)
+        else:
+            payload = ""
+        preview = Formatter.wrap_text(payload.removesuffix("\u0003\u001f"), 38)
+        return RenderedFrame(payload, preview, nekoosc.is_playing)
+
+    @staticmethod
+    def wrap_text(text, max_chars_per_line):
+        """Wrap text to fit within the specified number of characters per line."""
+        lines = text.splitlines()
+        wrapped_lines = []
+
+        for line in lines:
+            words = line.split()
+            current_line = ""
+            for word in words:
+                if len(current_line + word) + 1 <= max_chars_per_line:
+                    current_line += word + " "
+                else:
+                    wrapped_lines.append(current_line.strip())
+                    current_line = word + " "
+            wrapped_lines.append(current_line.strip())
+
+        return "\n".join(wrapped_lines)
+
+    @staticmethod
+    def format(nekoosc, idle=False):
+        """Render the compiled Format (or Idle) template with the current data."""
+        try:
+            def get_animation(name, percentage=0):
+                animation = nekoosc.animations[name]
+                if animation.type == "duration":
+                    return animation.frame_at_time().text
+                if nekoosc.is_playing and not percentage:
+                    percentage = nekoosc.clock.position() / nekoosc.totalduration * 100
+                return animation.frame_at_percent(percentage).text
+
+            def adjust_with_pulsoid(text):
+                pulsoid_text = templates["pulsoid"].render({"hr": hr or "", **hr_stats},
+                                                           lambda name: get_animation(name, int(hr) or 1))
+
+                pulsoid_text_length = len(pulsoid_text)
+                if text:
+                    if len(text) + pulsoid_text_length + 1 > 144:
+                        return text[:144 - pulsoid_text_length] + "\n" + pulsoid_text
+                    return text + "\n" + pulsoid_text
+                else:
+                    return pulsoid_text
+
+            templates = nekoosc.templates
+            template = templates["idle" if idle else "format"]
+            hr = 0
+            hr_stats = {}
+            if nekoosc.pulsoid_enabled:
+                hr = str(nekoosc.pulsoid_connector.get_latest_heart_rate(max_time=5))
+                if not hr:
+                    hr = 0
+                placeholders = template.placeholders | templates["pulsoid"].placeholders
+                if placeholders.intersection(Formatter.HEART_RATE_STATS):
+                    hr_stats = nekoosc.pulsoid_connector.get_heart_rate_stats(max_time=5)
+
+            if not idle:
+                for key, value in nekoosc.data.items():
+                    if not value and (key != "lyrics" or not nekoosc.is_playing):
+                        if nekoosc.pulsoid_enabled and int(hr) != 0:
+                            return adjust_with_pulsoid("")
+                        elif nekoosc.pulsoid_enabled and int(hr) == 0 and nekoosc.invisible:
+                            return adjust_with_pulsoid("") + "\u0003\u001f"
+                        return ""
+
+            text = template.render({**hr_stats, **nekoosc.data}, get_animation)
+
+            if nekoosc.pulsoid_enabled and int(hr) != 0:
+                if nekoosc.invisible:
+                    return adjust_with_pulsoid(text) + "\u0003\u001f"
+                else:
+                    return adjust_with_pulsoid(text)
+            elif nekoosc.invisible and not nekoosc.pulsoid_enabled or int(hr) == 0 and nekoosc.invisible:
+                return (text[:142] if len(text) >= 144 else text) + "\u0003\u001f"
+
+            return text
+
+        except Exception as e:
+            Logger.error(f"Error in Formatter: {e}")
+            return ""
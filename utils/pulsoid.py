@@ -2,21 +2,171 @@ import asyncio
 import time
 import logging
 import webbrowser
+from array import array
+from bisect import bisect_right
+from collections import deque
 
-import requests
 import websockets
 import json
 import urllib.parse
 import os
+import random
 import sys
 import threading
 from aiohttp import web
 import aiohttp
 import ctypes
 
+from utils.tasks import BackgroundService
+
+
+class HeartRateWindow:
+    """Fixed-size ring buffer of heart rate samples with rolling statistics over a time window.
+
+    Samples live in preallocated arrays, so memory stays bounded however long a session runs. The minimum and
+    maximum are tracked with monotonic deques and the mean with a running sum, making every statistic O(1)
+    amortized per sample.
+    """
+
+    ZONES = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+    def __init__(self, window=60, capacity=1024, max_hr=190, trend_threshold=2):
+        self.window = window
+        self.capacity = capacity
+        self.max_hr = max_hr
+        self.trend_threshold = trend_threshold
+        self._values = array("H", [0]) * capacity
+        self._times = array("d", [0.0]) * capacity
+        self._head = 0
+        self._tail = 0
+        self._sum = 0
+        self._min = deque()
+        self._max = deque()
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def _value(self, seq):
+        return self._values[seq % self.capacity]
+
+    def add(self, value, at):
+        """Append a sample taken at unix time ``at``, dropping samples that left the window or the buffer."""
+        value = max(0, min(int(value), 0xFFFF))
+        if len(self) == self.capacity:
+            self._pop()
+        index = self._tail % self.capacity
+        self._values[index] = value
+        self._times[index] = at
+        while self._min and self._value(self._min[-1]) >= value:
+            self._min.pop()
+        while self._max and self._value(self._max[-1]) <= value:
+            self._max.pop()
+        self._min.append(self._tail)
+        self._max.append(self._tail)
+        self._sum += value
+        self._tail += 1
+        self.expire(at)
+
+    def _pop(self):
+        self._sum -= self._value(self._head)
+        if self._min[0] == self._head:
+            self._min.popleft()
+        if self._max[0] == self._head:
+            self._max.popleft()
+        self._head += 1
+
+    def expire(self, now):
+        """Drop samples older than the window."""
+        while len(self) and self._times[self._head % self.capacity] < now - self.window:
+            self._pop()
+
+    @property
+    def latest(self):
+        return self._value(self._tail - 1) if len(self) else 0
+
+    @property
+    def minimum(self):
+        return self._value(self._min[0]) if self._min else 0
+
+    @property
+    def maximum(self):
+        return self._value(self._max[0]) if self._max else 0
+
+    @property
+    def mean(self):
+        return self._sum / len(self) if len(self) else 0.0
+
+    @property
+    def trend(self):
+        """Arrow comparing the latest sample with the window mean."""
+        difference = self.latest - self.mean
+        if difference > self.trend_threshold:
+            return "\u2191"
+        if difference < -self.trend_threshold:
+            return "\u2193"
+        return "\u2192"
+
+    @property
+    def zone(self):
+        """Heart rate zone of the window mean as a share of max_hr: 0 below 50%, then 1-5 in 10% steps."""
+        return bisect_right(self.ZONES, self.mean / self.max_hr) if self.max_hr else 0
+
+
+class HeartRateStore:
+    """Thread-safe holder for the most recent heart rate sample and the rolling window behind it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = None
+        self.measured_at = 0.0
+        self.received_at = 0.0
+        self.window = HeartRateWindow()
+
+    def update(self, value, measured_at=None):
+        """Store a sample; ``measured_at`` is a unix timestamp in seconds and defaults to now."""
+        now = time.time()
+        measured_at = measured_at or now
+        with self._lock:
+            self.received_at = now
+            if (value, measured_at) == (self.value, self.measured_at):
+                return
+            self.value = value
+            self.measured_at = measured_at
+            self.window.add(value, now)
+
+    def latest(self, max_time=0):
+        """Return the latest heart rate, or 0 if there is none or it is older than ``max_time`` seconds."""
+        with self._lock:
+            if self.value is None:
+                return 0
+            if max_time and self.measured_at < time.time() - max_time:
+                return 0
+            return self.value
+
+    def age(self):
+        """Seconds since the last sample was received."""
+        with self._lock:
+            return time.time() - self.received_at if self.received_at else float("inf")
+
+    def stats(self, max_time=0):
+        """Return the ``hr_*`` template values over the window, empty if the latest sample is too old."""
+        now = time.time()
+        with self._lock:
+            window = self.window
+            window.expire(now)
+            if not len(window) or max_time and self.measured_at < now - max_time:
+                return dict.fromkeys(("hr_avg", "hr_max", "hr_min", "hr_trend", "hr_zone"), "")
+            return {
+                "hr_avg": round(window.mean),
+                "hr_max": window.maximum,
+                "hr_min": window.minimum,
+                "hr_trend": window.trend,
+                "hr_zone": str(window.zone),
+            }
 
-class PulsoidConnector:
-    def __init__(self, logging=False):
+
+class PulsoidConnector(BackgroundService):
+    def __init__(self, logging=False, fallback_interval=5, max_backoff=60):
         self.access_token = None
         self.websocket = None
         self.heart_rate = None
@@ -24,6 +174,10 @@ class PulsoidConnector:
         self.pulsoidpath = os.path.join(os.getenv('LOCALAPPDATA'), 'Nekoware', 'Pulsoid')
         self.auth_file_path = os.path.join(self.pulsoidpath, "auth.json")
         self.logging = logging
+        self.store = HeartRateStore()
+        self.fallback_interval = fallback_interval
+        self.max_backoff = max_backoff
+        self.authorization_timeout = 300
 
     def _log(self, message, level=logging.INFO):
         if self.logging:
@@ -65,49 +219,51 @@ class PulsoidConnector:
             return None
 
     def get_latest_heart_rate(self, max_time=0):
-        """Retrieves the latest heart rate from the Pulsoid HTTP API, considering a maximum time threshold.
+        """Returns the latest heart rate pushed by the Pulsoid WebSocket (or the HTTP fallback).
 
         Args:
             self: (object) Reference to the class instance.
             max_time: (int, optional) The maximum age of the heart rate in seconds. Defaults to 0 (no limit).
 
         Returns:
-            The latest heart rate (int) if successful and within the time limit, None otherwise.
+            The latest heart rate (int) if there is one within the time limit, 0 otherwise.
         """
+        return self.store.latest(max_time)
+
+    def get_heart_rate_stats(self, max_time=0):
+        """Returns the rolling heart rate statistics as template values (see HeartRateStore.stats)."""
+        return self.store.stats(max_time)
+
+    async def _fetch_latest_heart_rate(self, session):
+        """Fetch the latest heart rate from the Pulsoid HTTP API into the store."""
         url = "https://dev.pulsoid.net/api/v1/data/heart_rate/latest?response_mode=json"
         headers = {
-            "Authorization": f"Bearer {self.return_access_token()}"
+            "Authorization": f"Bearer {self.access_token}"
         }
 
         try:
-            with requests.Session() as session:
-                response = session.get(url, headers=headers)
-
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if "data" in data and "heart_rate" in data["data"]:
-                        measured_at = data.get("measured_at", 0)
-                        if measured_at == 0 or int(measured_at) / 1000 >= time.time() - max_time:
-                            return data["data"]["heart_rate"]
-                        else:
-                            self._log("Heart rate data is too old (outside max_time threshold).")
-                            return 0
-                    else:
-                        self._log("Invalid response format. Heart rate not found.")
-                        return 0
-                except json.JSONDecodeError:
-                    self._log("Error decoding JSON response.")
-                    return 0
+            async with session.get(url, headers=headers) as response:
+                if response.status != 200:
+                    self._log(f"HTTP request failed with status code: {response.status}")
+                    return
+                data = await response.json(content_type=None)
+            if "data" in data and "heart_rate" in data["data"]:
+                measured_at = int(data.get("measured_at", 0)) / 1000
+                self.heart_rate = data["data"]["heart_rate"]
+                self.store.update(self.heart_rate, measured_at)
+                self._notify_listeners()
             else:
-                self._log(f"HTTP request failed with status code: {response.status_code}")
-                return 0
-        except requests.exceptions.RequestException as e:
+                self._log("Invalid response format. Heart rate not found.")
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
             self._log(f"A client error occurred: {e}")
-            return 0
-        except Exception as e:
-            self._log(f"An unexpected error occurred: {e}")
-            return 0
+
+    async def poll_fallback(self):
+        """Poll the HTTP API, at most once per fallback_interval, while the WebSocket is not delivering data."""
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            while True:
+                await asyncio.sleep(self.fallback_interval)
+                if self.access_token and self.store.age() >= self.fallback_interval:
+                    await self._fetch_latest_heart_rate(session)
 
     async def connect(self):
         if not self.access_token:
@@ -135,6 +291,7 @@ class PulsoidConnector:
                     data = json.loads(message)
                     if "data" in data and "heart_rate" in data["data"]:
                         self.heart_rate = data["data"]["heart_rate"]
+                        self.store.update(self.heart_rate, int(data.get("measured_at", 0)) / 1000)
                         self._notify_listeners()
                 except json.JSONDecodeError:
                     self._log(f"Received invalid JSON: {message}")
@@ -164,12 +321,29 @@ class PulsoidConnector:
             return None
 
     async def run(self):
+        """Keep the WebSocket connected, reconnecting with exponential backoff and jitter."""
+        attempt = 0
         while True:
-            if self.access_token:
-                if await self.connect():
+            if not self.access_token:
+                self.access_token = self.return_access_token()
+            if self.access_token and await self.connect():
+                try:
                     await self.receive_data()
-            self._log("Reconnecting in 5 seconds...")
-            await asyncio.sleep(5)
+                except (websockets.exceptions.WebSocketException, OSError) as e:
+                    self._log(f"WebSocket error: {e}")
+                finally:
+                    await self.websocket.close()
+                    self.websocket = None
+                if self.store.age() < self.max_backoff:
+                    attempt = 0
+            delay = min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            self._log(f"Reconnecting in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
+    def background(self):
+        """The WebSocket connection and the HTTP fallback poller."""
+        return self.run(), self.poll_fallback()
 
     async def _start_webserver(self, port=9630):
         async def handle_redirect(request):
@@ -212,14 +386,18 @@ class PulsoidConnector:
                                                           "Pulsoid Authorization", MB_YESNO)
                 return result == IDYES
 
-            if show_authorization_message():
+            if await asyncio.get_running_loop().run_in_executor(None, show_authorization_message):
                 self._log("User clicked Yes. Starting authorization process.", logging.INFO)
                 runner = await self._start_webserver()
                 webbrowser.open(
                     "https://pulsoid.net/oauth2/authorize?response_type=token&client_id=0ffcef8f-ef50-4393-ae7b-a91bbfc1c9df&redirect_uri=http://127.0.0.1:9630&scope=data:heart_rate:read&state=384c70b7-f672-45a7-beda-c0bd35fc9214")
-                while self.access_token is None:
+                deadline = time.monotonic() + self.authorization_timeout
+                while self.access_token is None and time.monotonic() < deadline:
                     await asyncio.sleep(1)
                 await runner.cleanup()
+                if self.access_token is None:
+                    self._log("Authorization timed out.", logging.INFO)
+                    return
                 self._log("Webserver stopped.", logging.DEBUG)
                 self._log("Starting Pulsoid connection...", logging.DEBUG)
             else:
@@ -314,6 +492,7 @@ def run_pulsoid_in_thread(pulsoid_connector):
 async def main():
     pulsoid_connector = PulsoidConnector()
     await pulsoid_connector.start_pulsoid()
+    pulsoid_connector.start()
     while True:
         print(pulsoid_connector.get_latest_heart_rate(max_time=5))
         await asyncio.sleep(1)
@@ -0,0 +1,29 @@
+from typing import Iterable, Optional
+
+
+class TickScheduler:
+    """Work out how long the worker may sleep before the chatbox output next changes.
+
+    The worker wakes at the earliest upcoming deadline (next lyric line, next animation frame, ...), never later
+    than the keepalive while playing or the idle interval while paused, and never sooner than ``min_interval``
+    after the previous tick started. Deadlines are pushed back by ``slack`` so that timer jitter does not wake the
+    worker just before the boundary, one ``min_interval`` too early to show it.
+    """
+
+    def __init__(self, min_interval: float = 1.5, keepalive: float = 3.0, idle_interval: float = 5.0,
+                 slack: float = 0.02):
+        self.min_interval = min_interval
+        self.keepalive = keepalive
+        self.idle_interval = idle_interval
+        self.slack = slack
+
+    def next_delay(self, deadlines: Iterable[Optional[float]], playing: bool, elapsed: float = 0.0) -> float:
+        """Return the number of seconds to sleep, given deadlines in seconds from now.
+
+        ``elapsed`` is how long ago the previous tick started.
+        """
+        delay = self.keepalive if playing else self.idle_interval
+        for deadline in deadlines:
+            if deadline is not None and deadline + self.slack < delay:
+                delay = deadline + self.slack
+        return max(delay, self.min_interval - elapsed, 0.0)
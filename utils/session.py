@@ -0,0 +1,26 @@
+import aiohttp
+
+
+class KeepAliveSession:
+    """A keep-alive aiohttp session shared by one API client, created on first use and again after ``close``."""
+
+    def __init__(self, timeout=10, limit=4, headers=None):
+        self.timeout = timeout
+        self.limit = limit
+        self.headers = headers
+        self.session = None
+
+    async def get(self):
+        """Return the session, creating it on the running event loop if needed."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=60),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
@@ -0,0 +1,195 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+
+import aiohttp
+
+from utils.session import KeepAliveSession
+from utils.tasks import BackgroundService, SingleFlight
+
+
+class SpotifyPlayback:
+    """Async client for the Spotify ``/me/player`` endpoint shared by every caller of a tick.
+
+    Concurrent callers share one in-flight request and later callers are served from the last response for as
+    long as it is fresh. How long that is adapts to playback: ``ttl`` while playing, cut short so the next poll
+    lands just after the track ends, and ``paused_ttl`` while paused. A 429 response pauses polling for its
+    ``Retry-After`` (or an exponential backoff) and keeps serving the last response meanwhile.
+    """
+
+    BASE_URL = "https://api.spotify.com/v1"
+
+    def __init__(self, get_token, base_url=None, ttl=2.0, paused_ttl=5.0, timeout=5):
+        self.get_token = get_token
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.ttl = ttl
+        self.paused_ttl = paused_ttl
+        self.session = KeepAliveSession(timeout, limit=2)
+        self.playback = None
+        self.fetched_at = 0.0
+        self.retry_at = 0.0
+        self.failures = 0
+        self.requests = 0
+        self._inflight = SingleFlight(self._fetch)
+
+    async def close(self):
+        await self.session.close()
+
+    def fresh_for(self, now=None):
+        """Seconds the cached playback stays fresh, adapted to the remaining time of the track."""
+        playback = self.playback
+        if not playback or not playback.get("is_playing"):
+            ttl = self.paused_ttl
+        else:
+            ttl = self.ttl
+            item = playback.get("item") or {}
+            if item.get("duration_ms"):
+                remaining = (item["duration_ms"] - (playback.get("progress_ms") or 0)) / 1000
+                ttl = min(ttl, max(0.25, remaining + 0.25))
+        now = time.monotonic() if now is None else now
+        return self.fetched_at + ttl - now
+
+    async def current_playback(self):
+        """Return the current playback state (the Web API JSON) or None when nothing is playing."""
+        now = time.monotonic()
+        if now < self.retry_at or self.fetched_at and self.fresh_for(now) > 0:
+            return self.playback
+        return await self._inflight()
+
+    async def _fetch(self):
+        token = self.get_token()
+        if inspect.isawaitable(token):
+            token = await token
+        session = await self.session.get()
+        self.requests += 1
+        try:
+            async with session.get(f"{self.base_url}/me/player",
+                                   headers={"Authorization": f"Bearer {token}"}) as response:
+                if response.status == 429:
+                    self._back_off(response.headers.get("Retry-After"))
+                    return self.playback
+                if response.status == 204:
+                    playback = None
+                elif response.status >= 400:
+                    self._back_off()
+                    return self.playback
+                else:
+                    playback = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._back_off()
+            return self.playback
+        self.failures = 0
+        self.playback = playback
+        self.fetched_at = time.monotonic()
+        return playback
+
+    def _back_off(self, retry_after=None):
+        """Hold off polling for ``Retry-After`` seconds, or exponentially longer after each failure."""
+        self.failures += 1
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = min(60.0, 2 ** self.failures)
+        self.retry_at = time.monotonic() + delay
+
+
+class SpotifyTokens(BackgroundService):
+    """Async Spotify OAuth token manager.
+
+    Tokens are refreshed with the refresh token ahead of expiry by a background task (``start``), so callers of
+    ``token()`` almost never wait on a token exchange. Tokens are persisted atomically to ``path``. ``authorize``
+    is a blocking callable returning a spotipy style token dict; it runs off the event loop, only when there is
+    no usable refresh token.
+    """
+
+    TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+    def __init__(self, client_id, client_secret, path, authorize=None, refresh_ahead=300, token_url=None,
+                 timeout=10):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.path = path
+        self.authorize = authorize
+        self.refresh_ahead = refresh_ahead
+        self.token_url = token_url or self.TOKEN_URL
+        self.timeout = timeout
+        self.token_info = self._load()
+        self.refreshes = 0
+        self.last_error = None
+        self._refreshing = SingleFlight(self._refresh)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, token_info):
+        """Write the token file through a temporary file so a crash never leaves it half written."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(token_info, f)
+        os.replace(temp_path, self.path)
+
+    def expires_in(self, now=None):
+        if not self.token_info:
+            return 0.0
+        return self.token_info.get("expires_at", 0) - (time.time() if now is None else now)
+
+    async def token(self):
+        """Return a valid access token, refreshing first only if the background refresh fell behind."""
+        if self.expires_in() <= 5:
+            await self.refresh()
+        return self.token_info["access_token"]
+
+    async def refresh(self):
+        """Refresh the tokens; concurrent callers share one exchange."""
+        await self._refreshing()
+
+    async def _refresh(self):
+        token_info = None
+        refresh_token = (self.token_info or {}).get("refresh_token")
+        if refresh_token:
+            token_info = await self._exchange(refresh_token)
+        if token_info is None:
+            if self.authorize is None:
+                raise RuntimeError("Spotify is not authorized")
+            token_info = await asyncio.get_running_loop().run_in_executor(None, self.authorize)
+            if not token_info:
+                raise RuntimeError("Spotify authorization failed")
+        token_info.setdefault("refresh_token", refresh_token)
+        token_info["expires_at"] = int(time.time()) + int(token_info.get("expires_in", 3600))
+        self.token_info = token_info
+        self.refreshes += 1
+        self._save(token_info)
+
+    async def _exchange(self, refresh_token):
+        """Trade a refresh token for new tokens; returns None if Spotify rejected the refresh token."""
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            async with session.post(self.token_url,
+                                    data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+                                    auth=aiohttp.BasicAuth(self.client_id, self.client_secret)) as response:
+                if response.status == 400:
+                    return None
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+    async def run(self):
+        """Keep the access token fresh, refreshing refresh_ahead seconds before it expires."""
+        failures = 0
+        while True:
+            delay = self.expires_in() - self.refresh_ahead
+            if delay > 0:
+                await asyncio.sleep(min(delay, 60))
+                continue
+            try:
+                await self.refresh()
+                failures = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, RuntimeError) as e:
+                self.last_error = e
+                failures += 1
+                await asyncio.sleep(min(300, 5 * 2 ** failures))
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_coro().__qualname__} failed", exc_info=task.exception())
+
+
+class BackgroundService:
+    """Mixin for objects that keep coroutines running on the event loop between ``start`` and ``stop``.
+
+    ``background`` returns the coroutines to run, ``run()`` by default. The tasks stay referenced until stopped and
+    a task that dies with an exception is logged instead of disappearing silently.
+    """
+
+    _tasks = ()
+
+    def background(self):
+        return (self.run(),)
+
+    def start(self):
+        """Start the background tasks on the running event loop, unless they are still running."""
+        if not self.running:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(coro) for coro in self.background()]
+            for task in self._tasks:
+                task.add_done_callback(_log_failure)
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = ()
+
+    @property
+    def running(self):
+        return any(not task.done() for task in self._tasks)
+
+
+class SingleFlight:
+    """Share one in-flight call of the coroutine function ``func`` between concurrent callers.
+
+    A caller that is cancelled does not cancel the call the others are waiting on; the next call after it
+    finished starts a new one.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self._task = None
+
+    async def __call__(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.func())
+        return await asyncio.shield(self._task)
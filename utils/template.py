@@ -0,0 +1,73 @@
+import re
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+class Template:
+    """A format string compiled into literal, placeholder and animation tokens."""
+
+    LITERAL = 0
+    PLACEHOLDER = 1
+    ANIMATION = 2
+
+    def __init__(self, text: str, placeholders: Iterable[str] = (), animations: Iterable[str] = ()):
+        self.text = text or ""
+        self.tokens: List[Tuple[int, str]] = []
+        self.placeholders = set()
+        self.animations = set()
+        self._compile(placeholders, animations)
+
+    def __bool__(self):
+        return bool(self.text)
+
+    def _compile(self, placeholders: Iterable[str], animations: Iterable[str]):
+        """Split the text into tokens, preferring the longest name when several match."""
+        alternatives = []
+        placeholders = sorted(set(placeholders), key=len, reverse=True)
+        animations = sorted(set(animations), key=len, reverse=True)
+        if placeholders:
+            alternatives.append(r"\$(?P<placeholder>" + "|".join(map(re.escape, placeholders)) + ")")
+        if animations:
+            alternatives.append(r"\*(?P<animation>" + "|".join(map(re.escape, animations)) + ")")
+
+        if not alternatives:
+            if self.text:
+                self.tokens.append((self.LITERAL, self.text))
+            return
+
+        position = 0
+        for match in re.finditer("|".join(alternatives), self.text):
+            if match.start() > position:
+                self.tokens.append((self.LITERAL, self.text[position:match.start()]))
+            name = match.group(match.lastgroup)
+            if match.lastgroup == "placeholder":
+                self.tokens.append((self.PLACEHOLDER, name))
+                self.placeholders.add(name)
+            else:
+                self.tokens.append((self.ANIMATION, name))
+                self.animations.add(name)
+            position = match.end()
+        if position < len(self.text):
+            self.tokens.append((self.LITERAL, self.text[position:]))
+
+    def render(self, values: Dict[str, object], animate: Callable[[str], str]) -> str:
+        """Render the template in a single pass.
+
+        Placeholders missing from ``values`` are left untouched, falsy values render as an empty string and
+        each referenced animation is evaluated once per render, no matter how often it appears.
+        """
+        parts = []
+        frames = {}
+        for kind, value in self.tokens:
+            if kind == self.LITERAL:
+                parts.append(value)
+            elif kind == self.PLACEHOLDER:
+                if value in values:
+                    replacement = values[value]
+                    parts.append(str(replacement) if replacement else "")
+                else:
+                    parts.append("$" + value)
+            else:
+                if value not in frames:
+                    frames[value] = animate(value)
+                parts.append(frames[value])
+        return "".join(parts)